@@ -2,7 +2,7 @@ from os import path
 from textual.screen import ModalScreen
 from textual.containers import Grid, Container
 from textual.app import ComposeResult
-from textual.widgets import Button, Input, Label, DirectoryTree, ListView, ListItem, Static
+from textual.widgets import Button, Input, Label, DirectoryTree, ListView, ListItem, Static, Select
 from textual.binding import Binding
 from textual.reactive import reactive
 
@@ -132,6 +132,97 @@ class InputDialog(ModalScreen):
         self.dismiss(None)
 
 
+class UrlDialog(ModalScreen):
+    BINDINGS = [
+        Binding("escape", "neutral", "Cancel", show=False),
+    ]
+
+    CSS_PATH="Dialogs.tcss"
+    CSS = """
+     #dialog {
+        padding: 1 2;
+        width: 70;
+        height: 19;
+        border: solid $accent;
+        background: $surface;
+        border_title_align: center;
+    }
+
+    #url-dialog-url {
+        margin: 1 0 0 0;
+    }
+
+    #url-dialog-options {
+        grid-size: 2;
+        grid-gutter: 0 2;
+        height: 5;
+        margin: 1 0;
+    }
+    """
+
+    def __init__(self, text="Enter URL:", title="Dialog", placeholder="", methods=None, buttons=OK_CANCEL, **kwargs):
+        """
+        text: str, label to display above inputs
+        title: str, dialog window title (shown in border)
+        placeholder: str, placeholder text for the URL input
+        methods: list of (label, value) tuples for the check method select, first one is the default
+        buttons: list of (label, action, variant) tuples or use predefined buttons: e.g. OK_CANCEL
+        Dismisses with a URL file line, e.g. "https://example.com interval=10 method=head"
+        """
+        super().__init__(**kwargs)
+        self.text = text
+        self.title = title
+        self.placeholder = placeholder
+        self.methods = methods or []
+        self.buttons = buttons
+
+    def compose(self) -> ComposeResult:
+        container = Container(
+            Static(self.text),
+            Input(placeholder=self.placeholder, id="url-dialog-url"),
+            Grid(
+                Input(placeholder="Interval (seconds, optional)", id="url-dialog-interval", restrict=r"[0-9.]*"),
+                Select(self.methods, value=self.methods[0][1], allow_blank=False, id="url-dialog-method") if self.methods else Static(),
+                id="url-dialog-options",
+            ),
+            Grid(*(Button(label, variant=variant, id=action) for label, action, variant in self.buttons), classes=f"btn-grid btn-grid-{len(self.buttons)}"),
+            id="dialog"
+        )
+        container.border_title = self.title
+        yield container
+
+    def on_mount(self) -> None:
+        self.styles.align_horizontal = "center"
+        self.styles.align_vertical = "middle"
+
+    def _value(self):
+        url = self.query_one("#url-dialog-url", Input).value.strip()
+        if not url:
+            return None
+        line = url
+        interval = self.query_one("#url-dialog-interval", Input).value.strip()
+        if interval:
+            line += f" interval={interval}"
+        if self.methods:
+            method = self.query_one("#url-dialog-method", Select).value
+            if method != self.methods[0][1]:
+                line += f" method={method}"
+        return line
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        action = event.button.id
+        if action == "positive":
+            self.dismiss(self._value())
+        else:
+            self.dismiss(None)
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        self.dismiss(self._value())
+
+    def action_neutral(self) -> None:
+        self.dismiss(None)
+
+
 class FileDialog(ModalScreen):
     BINDINGS = [
         Binding("escape", "neutral", "Cancel", show=False),
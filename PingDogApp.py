@@ -0,0 +1,811 @@
+import time
+from functools import lru_cache
+from  os import path
+from pathlib import Path
+from rich.text import Text
+from textual import work
+from textual.app import App, InvalidThemeError
+from textual.binding import Binding
+from textual.widgets import DataTable, Header, Footer, Static, ProgressBar, Input
+from textual.worker import get_current_worker
+from engine import ProbeEngine
+from instrument import Profiler
+from urlfile import iter_url_file, write_url_file, parse_url_line
+from tableview import TableView, RowFilter, SORT_KEYS
+import tablerows
+
+# URLs handed from the import worker to the UI at once
+IMPORT_CHUNK = 1000
+# Seconds the filter waits for typing to pause before the table is rebuilt
+FILTER_DELAY = 0.3
+# Seconds between two moves of rows whose sort key changed, a move touches every row in between
+PLACE_INTERVAL = 1.0
+# Seconds of rows added per frame when the table is rebuilt, so large tables fill in behind the first frames
+FILL_BUDGET = 0.02
+
+def ping_dog_commands():
+    # The command palette is loaded the first time it is opened
+    from PingDogCommands import PingDogCommands
+    return PingDogCommands
+
+class PingDog(App):
+    BINDINGS = [
+        Binding("ctrl+q", "quit", "Quit"),
+        Binding("i", "import", "Import URLs"),
+        Binding("e", "export", "Export URLs"),
+        Binding("d", "toggle_dark", "Dark"),
+        Binding("t", "change_theme", "Theme"),
+        Binding("a", "add_url", "Add URL"),
+        Binding("delete", "delete_url", "Delete URL"),
+        Binding("o", "sort", "Sort"),
+        Binding("r", "reverse_sort", "Reverse", show=False),
+        Binding("slash", "filter", "Filter"),
+        Binding("escape", "clear_filter", "Clear filter", show=False),
+        Binding("s", "toggle_status", "Stats"),
+        Binding("p", "toggle_profile", "Profile", show=False),
+        ]
+
+    COMMANDS = App.COMMANDS | {ping_dog_commands}
+
+    CSS = """
+    #details {
+        height: 1;
+        padding: 0 1;
+        background: $boost;
+    }
+    #progress {
+        display: none;
+        padding: 0 1;
+    }
+    #status {
+        display: none;
+        height: 1;
+        padding: 0 1;
+        background: $boost;
+    }
+    #filter {
+        display: none;
+    }
+    """
+
+    def __init__(self, config, urls, check_interval=30):
+        """
+        urls: dict of url -> Target (or None for the defaults), as returned by read_urls_from_file
+        """
+        super().__init__()
+        self.config = config
+        self.engine = ProbeEngine(config, urls, check_interval)
+        self.engine.add_listener(self.on_result)
+        self.engine.add_config_listener(self.on_config_change)
+        self.engine.alerts.add_listener(self.on_alerts)
+        self.table = None
+        self.details = None
+        self.selected = None
+        self.versions = {}
+        self.rendered = {}
+        self.dirty = set()
+        self.cells = {}
+        self.view = TableView()
+        self.row_keys = {}
+        self.misplaced = None
+        self.place_pending = False
+        self.last_place = 0.0
+        self.resized = False
+        self.filling = None
+        self.fill_pending = False
+        self.filter_timer = None
+        self.flush_pending = False
+        self.last_flush = 0.0
+        self.ui_time = 0.0
+        self.ui_time_mark = time.monotonic()
+        self.profiler = Profiler()
+
+    def watch_theme(self, theme:str):
+        if self.config.theme != theme:
+            self.config.theme = theme
+
+    def compose(self):
+        yield Header(show_clock= True)
+        yield Static(id="status")
+        yield DataTable()
+        yield Input(id="filter", placeholder="Filter: errors, 2xx-5xx, tag:name or part of the URL")
+        yield Static(id="details")
+        yield ProgressBar(id="progress", show_eta=False)
+        yield Footer()
+
+    def on_mount(self):
+        try:
+            self.theme = self.config.theme
+        except InvalidThemeError:
+            self.notify(f"Unknown theme {self.config.theme!r} in config.yml", severity="warning")
+        if self.config.problems:
+            self.notify("\n".join(self.config.problems), title="config.yml", severity="warning")
+        self.table = table = self.query_one(DataTable)
+        self.details = self.query_one("#details", Static)
+        table.add_columns(*self.columns)
+        # The rows of the first screen are there for the first frame, the rest follow frame by frame
+        self.update_table(full=True)
+        self.update_stats()
+        self.set_interval(1, self.update_stats)
+        self.start_engine()
+
+    @work(exclusive=True, group="engine")
+    async def start_engine(self):
+        # Rows show the state from the last run until the first checks come in
+        for url in await self.engine.restore():
+            self.mark_dirty(url)
+        self.flush_rows()
+        await self.engine.start(wait=False)
+
+    def on_config_change(self, problems):
+        try:
+            self.theme = self.config.theme
+        except InvalidThemeError:
+            problems = problems + [f"Unknown theme {self.config.theme!r}"]
+        if problems:
+            self.notify("\n".join(problems), title="Reloaded config.yml", severity="warning")
+        else:
+            self.notify("Reloaded config.yml")
+
+    def on_alerts(self, groups):
+        for group in groups:
+            state = group["state"]
+            severity = "information" if state == "up" else "error" if state == "down" else "warning"
+            self.notify(group["summary"], title="Alert", severity=severity)
+
+    async def on_unmount(self):
+        await self.engine.stop()
+
+    def action_add_url(self) -> None:
+        from Dialogs import UrlDialog
+        self.push_screen(
+            UrlDialog(
+                text="Enter URL to add:",
+                title="Add URL",
+                placeholder="https://example.com",
+                methods=[
+                    ("GET", "get"),
+                    ("HEAD (GET fallback)", "head"),
+                    ("GET first byte only", "range"),
+                    ("TCP connect", "tcp"),
+                    ("TLS handshake", "tls"),
+                ],
+                buttons=[("Cancel", "neutral", "error"), ("Add", "positive", "primary")]
+            ),
+            lambda result: self.add_url(result) if result else None
+        )
+
+    def action_delete_url(self) -> None:
+        from Dialogs import QuestionDialog
+        table = self.query_one(DataTable)
+        if table.row_count:
+            url = table.coordinate_to_cell_key(table.cursor_coordinate).row_key.value
+            self.push_screen(
+                QuestionDialog(
+                    text=f"Delete URL?\n{url}",
+                    title="Confirm Deletion",
+                    buttons=[("Cancel", "neutral", "primary"), ("Delete", "positive", "error")]
+                ),
+                lambda result: self.delete_url(url) if result else None
+            )
+
+    def busy(self, group, action):
+        """True (and tells the user) while a worker of the group is running."""
+        if any(worker.group == group and not worker.is_finished for worker in self.workers):
+            self.notify(f"{action} is still running, try again once it is done", severity="warning")
+            return True
+        return False
+
+    def action_import(self) -> None:
+        from Dialogs import FileDialog, OptionDialog
+
+        if self.busy("import", "An import"):
+            return
+
+        def confirm(result): 
+            if result :
+                if len(self.engine.urls) == 0 :
+                    self.import_urls(result) 
+                else :
+                    self.push_screen(
+                        OptionDialog(
+                            text="There are URLs already in your workspace. How do you want to import new URLs?",
+                            title="Import URLs Options",
+                            options=[
+                                ("Cancel", "cancel"),
+                                ("Open (replace)", "open"),
+                                ("Append", "append"),
+                            ],
+                        ),
+                        lambda res: self.import_urls(result) if res == "open"
+                        else self.import_urls(result, True) if res == "append"
+                        else None
+                    )
+
+        self.push_screen(
+            FileDialog(
+                text="Select file to import URLs from:",
+                title="Import URLs",
+                select_type="file",
+                check_exists=True,
+                buttons=[("Cancel", "neutral", "error"), ("Import", "positive", "primary")],
+                start_path=path.curdir
+            ), confirm
+        )
+        
+    def action_export(self) -> None:
+        from Dialogs import FileDialog, QuestionDialog
+
+        if self.busy("export", "An export"):
+            return
+
+        def confirm(result):
+            if result:
+                if Path(result).exists():
+                    self.push_screen(
+                        QuestionDialog(
+                            text=f"File already exists, Do you want to overwrite?\n{result}",
+                            title="Confirm Overwrite",
+                            buttons=[("Cancel", "neutral", "primary"), ("Overwrite", "positive", "error")]
+                        ),
+                        lambda res: self.export_urls(result) if res else None
+                    )
+                else:
+                    self.export_urls(result)
+                    
+        self.push_screen(
+            FileDialog(
+                text="Select file to export URLs to:",
+                title="Export URLs",
+                select_type="file",
+                check_exists=False,
+                buttons=[("Cancel", "neutral", "error"), ("Export", "positive", "primary")],
+                start_path=path.curdir
+            ), confirm
+        )
+    
+    def add_url(self, line: str):
+        try:
+            url, target = parse_url_line(line)
+        except ValueError as e:
+            self.notify(str(e), severity="error")
+            return
+        if self.engine.add(url, target): # Ensure distinct URLs
+            self.update_table(added=[url])
+            self.notify(f"Added URL: {url}")
+        elif target and target != self.engine.urls.target(url):
+            self.engine.set_target(url, target)
+            # New tags can move the URL in or out of the filter
+            self.mark_dirty(url)
+            self.flush_rows()
+            self.notify(f"Changed settings of {url}")
+        else:
+            self.notify(f"URL already exists: {url}", severity="warning")
+
+    def delete_url(self, url: str):
+        if self.engine.remove(url):
+            self.update_table(removed=[url])
+            self.notify(f"Deleted URL: {url}")
+
+    # Imports and exports have their own groups, so one never cancels the other
+    @work(thread=True, group="import")
+    def import_urls(self, filePath, append=False):
+        """Streams the file in, handing chunks of URLs to the UI so checks and rendering go on."""
+        worker = get_current_worker()
+        skipped = []
+        seen = set()
+        chunk = {}
+        try:
+            self.call_from_thread(self.show_progress, path.getsize(filePath))
+            for url, target in iter_url_file(
+                filePath,
+                on_error=lambda number, error: skipped.append((number, error)),
+                progress=lambda position: self.call_from_thread(self.set_progress, position),
+            ):
+                if worker.is_cancelled:
+                    self.call_from_thread(
+                        self.notify,
+                        f"Import from {filePath} cancelled after {len(seen)} URLs"
+                        + ("" if append else ", URLs missing from the file were kept"),
+                        severity="warning",
+                    )
+                    return
+                chunk[url] = target
+                if len(chunk) >= IMPORT_CHUNK:
+                    self.call_from_thread(self.add_chunk, chunk)
+                    seen.update(chunk)
+                    chunk = {}
+            self.call_from_thread(self.add_chunk, chunk)
+            seen.update(chunk)
+            if not append:
+                self.call_from_thread(self.remove_unseen, seen)
+            message = f"Imported {len(seen)} URLs from {filePath}"
+            if skipped:
+                message += f", skipped {len(skipped)} invalid lines (line {skipped[0][0]}: {skipped[0][1]})"
+            self.call_from_thread(self.notify, message, severity="warning" if skipped else "information")
+        except Exception as e:
+            self.call_from_thread(self.notify, f"Failed to import: {e}", severity="error")
+        finally:
+            self.call_from_thread(self.hide_progress)
+
+    def add_chunk(self, entries):
+        self.update_table(added=self.engine.add_many(entries))
+
+    def remove_unseen(self, seen):
+        self.update_table(removed=self.engine.remove_many([url for url in self.engine.urls if url not in seen]))
+
+    def export_urls(self, filePath):
+        # Snapshot on the UI thread, the registry keeps changing while the file is written
+        self.export_worker(filePath, list(self.engine.urls.items()))
+
+    @work(thread=True, group="export")
+    def export_worker(self, filePath, entries):
+        try:
+            self.call_from_thread(self.show_progress, len(entries))
+            write_url_file(filePath, entries, progress=lambda count: self.call_from_thread(self.set_progress, count))
+            self.call_from_thread(self.notify, f"Exported {len(entries)} URLs to {filePath}")
+        except Exception as e:
+            self.call_from_thread(self.notify, f"Failed to export: {e}", severity="error")
+        finally:
+            self.call_from_thread(self.hide_progress)
+
+    def show_progress(self, total):
+        progress = self.query_one("#progress", ProgressBar)
+        progress.update(total=total, progress=0)
+        progress.display = True
+
+    def set_progress(self, value):
+        self.query_one("#progress", ProgressBar).update(progress=value)
+
+    def hide_progress(self):
+        self.query_one("#progress", ProgressBar).display = False
+
+    def on_result(self, url, result):
+        self.mark_dirty(url)
+        if not self.flush_pending:
+            # Repaint at most refresh_rate times per second, batching rows in between
+            self.flush_pending = True
+            delay = self.last_flush + 1 / self.config.refresh_rate - time.monotonic()
+            if delay > 0:
+                self.set_timer(delay, self.flush_rows)
+            else:
+                self.call_later(self.flush_rows)
+
+    def flush_rows(self):
+        start = time.perf_counter()
+        self.flush_pending = False
+        self.last_flush = time.monotonic()
+        if self.filling is not None:
+            # Results that come in meanwhile are applied once the rebuild is done
+            return
+        if self.selected in self.dirty:
+            self.update_details()
+        entering = []
+        leaving = []
+        for url in list(self.dirty):
+            if url in self.engine.urls:
+                visible, changed = self.view.update(url, self.engine.urls.target(url), self.engine.metrics.get(url))
+                if changed:
+                    self.misplace(*changed)
+                if visible != (url in self.row_keys):
+                    # The result moved the URL in or out of the filter
+                    self.dirty.discard(url)
+                    (entering if visible else leaving).append(url)
+                    continue
+            self.update_row(url)
+        if self.resized:
+            self.resize_table()
+        self.apply_rows(entering, leaving)
+        self.ui_time += time.perf_counter() - start
+
+    def on_data_table_cell_highlighted(self, event: DataTable.CellHighlighted) -> None:
+        self.selected = event.cell_key.row_key.value
+        self.update_details()
+
+    def update_details(self):
+        url = self.selected
+        metrics = self.engine.metrics.get(url)
+        if metrics is None:
+            text = f"{url}: not checked yet" if url else ""
+        else:
+            text = (
+                f"{url}  DNS: {format_ms(metrics.get('dns'))}"
+                f" | Connect: {format_ms(metrics.get('connect'))}"
+                f" | Server: {format_ms(metrics.get('ttfb'))}"
+                f" | Total: {format_ms(metrics.get('response_time'))}"
+            )
+        tags = self.engine.urls.target(url).tags if url else ()
+        if tags:
+            text += f" | Tags: {', '.join(tags)}"
+        # Kept from on_mount: highlights can still arrive while the screen is torn down
+        self.details.update(Text(text, no_wrap=True, overflow="ellipsis"))
+
+    def update_stats(self):
+        if self.engine.scheduler is None:
+            self.sub_title = "Starting"
+            return
+        stats = self.engine.stats()
+        self.sub_title = (
+            f"Probes/s: {stats['rate']:.1f} | In flight: {stats['in_flight']}"
+            f" | Backlog: {stats['backlog']} | Skipped: {stats['skipped']}"
+        )
+        if self.view.filter:
+            self.sub_title += f" | Showing: {self.table.row_count}/{len(self.engine.urls)}"
+        now = time.monotonic()
+        ui_share = self.ui_time / (now - self.ui_time_mark) if now > self.ui_time_mark else 0.0
+        self.ui_time = 0.0
+        self.ui_time_mark = now
+        status = self.query_one("#status", Static)
+        if status.display:
+            pool = f"{stats['pool_in_use']}/{stats['pool_size']}" if stats["pool_size"] is not None else "workers"
+            memory = f"{stats['memory'] / 1048576:.0f} MB" if stats["memory"] is not None else "N/A"
+            hit_ratio = stats.get("dns_hit_ratio")
+            dns = f"{hit_ratio:.0%} cached, {stats['dns_failures']} failed" if hit_ratio is not None else "N/A"
+            status.update(
+                f"Loop lag: {format_ms(stats['loop_lag_max'])} max, {format_ms(stats['loop_lag_avg'])} avg"
+                f" | First cycle: {format_seconds(stats['cycle_duration'])}"
+                f" | Table: {ui_share:.0%} busy"
+                f" | Pool: {pool}"
+                f" | Memory: {memory}"
+                f" | DNS: {dns}"
+            )
+
+    def action_toggle_status(self):
+        status = self.query_one("#status", Static)
+        status.display = not status.display
+        self.update_stats()
+
+    def action_toggle_profile(self):
+        if not self.profiler.running:
+            self.profiler.start()
+            self.notify("Profiling, press p again to stop")
+            return
+        file_path = path.join(path.dirname(self.config.yaml_path), time.strftime("pingdog-%Y%m%d-%H%M%S.prof"))
+        self.profiler.stop(file_path)
+        self.notify(f"Profile written to {file_path}")
+
+    columns = [
+        ("URL", "url"),
+        ("Status", "status"),
+        ("Response Time", "response_time"),
+        ("p50", "p50"),
+        ("p95", "p95"),
+        ("p99", "p99"),
+        ("Uptime", "uptime"),
+        ("Trend", "trend"),
+        ("Last Checked", "last_checked"),
+        ("Connection", "connection"),
+    ]
+
+    def update_table(self, added=(), removed=(), full=False):
+        """
+        Applies added and removed URLs to the table in one refresh.
+        full: re-index every URL and rebuild the table instead
+        """
+        start = time.perf_counter()
+        for url in removed:
+            self.forget_row(url)
+            self.view.remove(url)
+        if full or self.filling is not None:
+            # Added rows can't go after the ones a rebuild still has to add
+            self.view.build((url, self.engine.metrics.get(url)) for url in self.engine.urls)
+            self.rebuild_rows()
+        else:
+            if removed and self.misplaced:
+                # Positions after a removed URL shifted
+                self.misplace(0, len(self.view.index) - 1)
+            entering = []
+            for url in added:
+                visible, changed = self.view.update(url, self.engine.urls.target(url), self.engine.metrics.get(url))
+                if changed:
+                    self.misplace(*changed)
+                if visible and url not in self.row_keys:
+                    entering.append(url)
+            self.apply_rows(entering, [url for url in removed if url in self.row_keys])
+            self.place_rows()
+        self.ui_time += time.perf_counter() - start
+        self.flush_rows()
+
+    def apply_rows(self, entering, leaving):
+        """Adds and removes rows. Added rows go last, for place_rows to move."""
+        table = self.table
+        if len(leaving) > table.row_count // 2:
+            # Removing rows one by one is linear each, rebuild instead
+            self.rebuild_rows()
+            return
+        for url in leaving:
+            table.remove_row(self.row_keys.pop(url))
+            self.cells.pop(url, None)
+            self.rendered.pop(url, None)
+        for url in entering:
+            self.add_row(url)
+            if not self.view.last(url):
+                # Every URL from this one to the end of the display order takes up the table's last rows
+                position = self.view.index.position(url)
+                self.misplace(*((0, position) if self.view.reverse else (position, len(self.view.index) - 1)))
+
+    def rebuild_rows(self):
+        """
+        Refills the table with the URLs the view shows, in its order. The rows that fit in
+        FILL_BUDGET are added right away, the others in the frames after.
+        """
+        self.table.clear()
+        self.row_keys.clear()
+        self.cells.clear()
+        self.rendered.clear()
+        self.misplaced = None
+        self.filling = iter(list(self.view.visible(self.engine.urls, self.engine.metrics)))
+        self.fill_rows()
+
+    def fill_rows(self):
+        """Adds the next FILL_BUDGET worth of rows of a rebuild."""
+        deadline = time.perf_counter() + FILL_BUDGET
+        for url in self.filling:
+            if url in self.engine.urls:
+                dirty = url in self.dirty
+                self.add_row(url)
+                if dirty:
+                    # Still to be re-indexed by flush_rows
+                    self.dirty.add(url)
+            if time.perf_counter() >= deadline:
+                if not self.fill_pending:
+                    self.fill_pending = True
+                    self.call_after_refresh(self.fill_later)
+                return
+        self.filling = None
+        self.follow_selected(scroll=True)
+        # What was held back while the rows were added
+        self.place_rows()
+        self.flush_rows()
+
+    def fill_later(self):
+        self.fill_pending = False
+        if self.filling is not None:
+            start = time.perf_counter()
+            self.fill_rows()
+            self.ui_time += time.perf_counter() - start
+
+    def add_row(self, url):
+        self.dirty.discard(url)
+        self.cells[url] = cells = self.render_cells(url)
+        self.row_keys[url] = self.table.add_row(*cells.values(), key=url)
+        self.rendered[url] = self.versions.get(url, 0)
+
+    def resize_table(self):
+        # Recomputes the scrollable width from the widened columns once the table is idle
+        self.resized = False
+        tablerows.resize_table(self.table)
+
+    def misplace(self, first, last):
+        """
+        Notes that rows of the URLs between these index positions may be out of order,
+        and moves them at most once per PLACE_INTERVAL.
+        """
+        if self.misplaced is not None:
+            first = min(first, self.misplaced[0])
+            last = max(last, self.misplaced[1])
+        self.misplaced = (first, last)
+        if not self.place_pending:
+            self.place_pending = True
+            delay = self.last_place + PLACE_INTERVAL - time.monotonic()
+            if delay > 0:
+                self.set_timer(delay, self.place_rows)
+            else:
+                self.call_later(self.place_rows)
+
+    def place_rows(self):
+        """
+        Moves misplaced rows to their position in the view order. DataTable only reorders with a
+        comparison sort of every row, while the index already has the order, so tablerows sets the
+        row locations directly. Rows of the misplaced URLs only swap places within the block of
+        table positions they already take up.
+        """
+        self.place_pending = False
+        if self.misplaced is None or self.filling is not None:
+            # Rows of a rebuild in progress are placed once it is done
+            return
+        start = time.perf_counter()
+        first, last = self.misplaced
+        self.misplaced = None
+        self.last_place = time.monotonic()
+        row_keys = self.row_keys
+        keys = [row_keys[url] for url in self.view.index.between(first, last) if url in row_keys]
+        if self.view.reverse:
+            keys.reverse()
+        tablerows.place_rows(
+            self.table, keys, "url",
+            lambda: {url: position for position, url in enumerate(self.view.visible(self.engine.urls, self.engine.metrics))},
+        )
+        self.follow_selected()
+        self.ui_time += time.perf_counter() - start
+
+    def follow_selected(self, scroll=False):
+        """Keeps the cursor on the selected URL when rows move under it."""
+        table = self.table
+        if self.selected in table.rows:
+            row = table.get_row_index(self.selected)
+            if row != table.cursor_row:
+                table.move_cursor(row=row, scroll=scroll)
+
+    def sort_table(self, column, reverse):
+        start = time.perf_counter()
+        self.view.sort_by(column, reverse, ((url, self.engine.metrics.get(url)) for url in self.engine.urls))
+        for label, key in self.columns:
+            if key == (column or "url") and self.view.sorted:
+                label += " ▼" if reverse else " ▲"
+            table_column = self.table.columns[key]
+            table_column.label = Text(label)
+            table_column.content_width = max(table_column.content_width, table_column.label.cell_len)
+        self.resize_table()
+        self.misplace(0, len(self.view.index) - 1)
+        self.place_rows()
+        self.ui_time += time.perf_counter() - start
+
+    def action_sort(self):
+        columns = [None, "status", "response_time", "last_checked"]
+        self.sort_table(columns[(columns.index(self.view.column) + 1) % len(columns)], False)
+
+    def action_reverse_sort(self):
+        self.sort_table(self.view.column, not self.view.reverse)
+
+    def on_data_table_header_selected(self, event: DataTable.HeaderSelected) -> None:
+        column = event.column_key.value
+        if column not in SORT_KEYS:
+            return
+        column = None if column == "url" else column
+        self.sort_table(column, column == self.view.column and not self.view.reverse)
+
+    def action_filter(self):
+        filter_input = self.query_one("#filter", Input)
+        filter_input.display = True
+        filter_input.focus()
+
+    def action_clear_filter(self):
+        filter_input = self.query_one("#filter", Input)
+        if filter_input.display:
+            filter_input.value = ""
+            filter_input.display = False
+            self.table.focus()
+            self.apply_filter("")
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        if event.input.id == "filter":
+            # Rebuilding a large table on every key press would lag behind the typing
+            if self.filter_timer is not None:
+                self.filter_timer.stop()
+            self.filter_timer = self.set_timer(FILTER_DELAY, lambda: self.apply_filter(event.value))
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        if event.input.id == "filter":
+            self.apply_filter(event.value)
+            if not event.value.strip():
+                event.input.display = False
+            self.table.focus()
+
+    def apply_filter(self, query):
+        if self.filter_timer is not None:
+            self.filter_timer.stop()
+            self.filter_timer = None
+        if query.strip() == self.view.filter.query:
+            return
+        start = time.perf_counter()
+        self.view.filter = RowFilter(query)
+        self.rebuild_rows()
+        self.ui_time += time.perf_counter() - start
+
+    def forget_row(self, url):
+        self.versions.pop(url, None)
+        self.cells.pop(url, None)
+        self.rendered.pop(url, None)
+        self.dirty.discard(url)
+
+    def mark_dirty(self, url):
+        self.versions[url] = self.versions.get(url, 0) + 1
+        self.dirty.add(url)
+
+    def update_row(self, url):
+        self.dirty.discard(url)
+        version = self.versions.get(url, 0)
+        if url not in self.row_keys or self.rendered.get(url) == version:
+            return
+        self.rendered[url] = version
+        cells = self.render_cells(url)
+        previous = self.cells.get(url, {})
+        columns = self.table.columns
+        for column, text in cells.items():
+            old = previous.get(column)
+            if old is None or old.plain != text.plain or old.style != text.style:
+                if text.cell_len > columns[column].content_width:
+                    # Columns only ever grow. DataTable's update_width re-measures the whole
+                    # column for every flagged cell narrower than another one, so widen here
+                    columns[column].content_width = text.cell_len
+                    self.resized = True
+                self.table.update_cell(url, column, text)
+        self.cells[url] = cells
+
+    def render_cells(self, url):
+        metrics = self.engine.metrics.get(url, {})
+        status = metrics.get("status")
+        error = metrics.get("error")
+        response_time = metrics.get("response_time")
+        last_checked = metrics.get("last_checked")
+        reused = metrics.get("reused")
+
+        if metrics.get("circuit"):
+            status_text = Text(error, style="magenta")
+        elif metrics.get("dns_error"):
+            status_text = Text(f"DNS error: {error}", style="dark_orange")
+        elif error and status is not None:
+            # The response came in but its body failed a check
+            status_text = Text(f"{status} {error}", style="red")
+        elif error:
+            status_text = Text(f"Error: {error}", style="red")
+        elif metrics.get("up") and status is None:
+            # tcp and tls checks have no HTTP status
+            cert_expires = metrics.get("cert_expires")
+            if cert_expires is None:
+                status_text = Text("Open", style="green")
+            else:
+                days = (cert_expires - last_checked) / 86400
+                style = "green" if days > 14 else "yellow" if days > 0 else "red"
+                status_text = Text(f"TLS OK, certificate expires in {days:.0f}d", style=style)
+        else:
+            if metrics.get("up"):
+                style = "green"
+            else:
+                style = "yellow" if 400 <= (status or 0) < 500 else "red"
+            status_text = Text(str(status), style=style) if status else Text("N/A")
+        backoff = metrics.get("backoff", 1)
+        if backoff > 1:
+            status_text.append(f" (backoff x{backoff})", style="dim")
+
+        response_text = Text((
+            f"{response_time:.2f}s" if response_time is not None else "N/A"
+        ))
+        last_checked_text = Text((
+            format_timestamp(int(last_checked))
+            if last_checked
+            else "N/A"
+        ))
+        history = self.engine.history.get(url)
+        percentiles = {
+            column: Text(f"{value:.2f}s" if value is not None else "N/A")
+            for column, value in (
+                ("p50", history.percentile(0.50) if history else None),
+                ("p95", history.percentile(0.95) if history else None),
+                ("p99", history.percentile(0.99) if history else None),
+            )
+        }
+        uptime = history.uptime() if history else None
+        if uptime is None:
+            uptime_text = Text("N/A")
+        else:
+            style = "green" if uptime >= 0.99 else "yellow" if uptime >= 0.9 else "red"
+            uptime_text = Text(f"{uptime:.1%}", style=style)
+        trend_text = Text(history.sparkline() if history else "")
+        connection_text = (
+            Text("N/A") if reused is None
+            else Text("warm", style="green") if reused
+            else Text("new", style="yellow")
+        )
+
+        return {
+            "url": Text(url),
+            "status": status_text,
+            "response_time": response_text,
+            **percentiles,
+            "uptime": uptime_text,
+            "trend": trend_text,
+            "last_checked": last_checked_text,
+            "connection": connection_text,
+        }
+
+def format_ms(seconds):
+    return f"{seconds * 1000:.1f}ms" if seconds is not None else "-"
+
+def format_seconds(seconds):
+    return f"{seconds:.2f}s" if seconds is not None else "-"
+
+@lru_cache(maxsize=1024)
+def format_timestamp(seconds):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(seconds))
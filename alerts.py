@@ -0,0 +1,243 @@
+import asyncio
+import json
+import shutil
+import sys
+import time
+from collections import deque
+import aiohttp
+
+# URLs named in an alert's summary, the rest are counted
+SUMMARY_URLS = 3
+# Seconds a webhook, command or desktop notification may take
+SEND_TIMEOUT = 10
+
+LABELS = {
+    "down": "down",
+    "up": "back up",
+    "degraded": "degraded",
+    "flapping": "flapping",
+}
+
+
+class UrlState:
+    __slots__ = ("state", "candidate", "streak", "since", "changes", "flapping")
+
+    def __init__(self):
+        self.state = None
+        self.candidate = None
+        self.streak = 0
+        self.since = None
+        self.changes = deque()
+        self.flapping = False
+
+
+class AlertManager:
+    def __init__(self, failures=3, recoveries=2, slow=0, flap_changes=4, flap_window=600,
+                 batch_interval=5, webhook="", command="", desktop=False, ssl_context=None):
+        """
+        Turns results into up/down/degraded alerts and sends them in groups.
+        failures: int, failed (or slow) checks in a row before a URL is reported down (or degraded)
+        recoveries: int, good checks in a row before it is reported back up
+        slow: float, response time in seconds above which an up URL is degraded (0 = never)
+        flap_changes: int, state changes within flap_window seconds that mark a URL as flapping;
+                      its changes are held back until it keeps one state for flap_window seconds
+        batch_interval: float, seconds alerts are collected before they are grouped and sent
+        webhook: str, URL the alerts are POSTed to as JSON ('' = disabled)
+        command: str, shell command run with the alerts as JSON on stdin ('' = disabled)
+        desktop: bool, show a desktop notification per group
+        ssl_context: ssl.SSLContext for HTTPS webhooks, the system CA store if None
+        """
+        self.failures = failures
+        self.recoveries = recoveries
+        self.slow = slow
+        self.flap_changes = flap_changes
+        self.flap_window = flap_window
+        self.batch_interval = batch_interval
+        self.webhook = webhook
+        self.command = command
+        self.desktop = desktop
+        self.ssl_context = ssl_context
+        self.states = {}
+        self.pending = {}
+        self.listeners = []
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.sending = None
+        self.session = None
+        self.sent = 0
+        self.failed = 0
+
+    def add_listener(self, callback):
+        """callback: callable(groups) invoked with every batch, before it is sent anywhere else"""
+        self.listeners.append(callback)
+
+    def start(self):
+        self.task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.sending is not None:
+            # A batch already taken from pending is finished, not lost
+            await asyncio.gather(self.sending, return_exceptions=True)
+        # Alerts still waiting for their batch are sent right away
+        await self._send_pending()
+        if self.session is not None:
+            await self.session.close()
+
+    def forget(self, urls):
+        for url in urls:
+            self.states.pop(url, None)
+            self.pending.pop(url, None)
+
+    def __call__(self, url, result):
+        if not self.failures:
+            return
+        if not result["up"]:
+            observed = "down"
+        elif self.slow and (result["response_time"] or 0) > self.slow:
+            observed = "degraded"
+        else:
+            observed = "up"
+        state = self.states.get(url)
+        if state is None:
+            state = self.states[url] = UrlState()
+        if observed != state.candidate:
+            state.candidate = observed
+            state.streak = 0
+            state.since = result["last_checked"]
+        state.streak += 1
+        now = time.monotonic()
+        if state.flapping and now - state.changes[-1] >= self.flap_window:
+            # Stable again, report where it settled
+            state.flapping = False
+            state.changes.clear()
+            self._alert(url, state, state.state, "flapping", result)
+        if observed == state.state:
+            return
+        if state.streak < (self.recoveries if observed == "up" else self.failures):
+            return
+        previous = state.state
+        state.state = observed
+        if previous is None and observed == "up":
+            # The first state of a URL is only news when something is wrong
+            return
+        changes = state.changes
+        changes.append(now)
+        while changes[0] < now - self.flap_window:
+            changes.popleft()
+        if state.flapping:
+            return
+        if self.flap_changes and len(changes) >= self.flap_changes:
+            state.flapping = True
+            self._alert(url, state, "flapping", previous, result)
+            return
+        self._alert(url, state, observed, previous, result)
+
+    def _alert(self, url, state, new, previous, result):
+        pending = self.pending.pop(url, None)
+        if pending is not None:
+            # Only the latest change of a URL within a batch is sent, compared to what was sent before
+            previous = pending["previous"]
+            if previous == new:
+                return
+        self.pending[url] = {
+            "url": url,
+            "state": new,
+            "previous": previous,
+            "since": state.since,
+            "status": result["status"],
+            "error": result["error"],
+            "response_time": result["response_time"],
+        }
+        self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            await self.wakeup.wait()
+            # Everything that happens within the interval goes out together
+            await asyncio.sleep(self.batch_interval)
+            self.wakeup.clear()
+            # Shielded, so stop() can wait for a batch that is on its way
+            self.sending = asyncio.ensure_future(self._send_pending())
+            await asyncio.shield(self.sending)
+            self.sending = None
+
+    async def _send_pending(self):
+        alerts, self.pending = self.pending, {}
+        if alerts:
+            await self.send(group_alerts(alerts.values()))
+
+    async def send(self, groups):
+        for listener in self.listeners:
+            listener(groups)
+        sends = []
+        if self.webhook:
+            sends.append(self.send_webhook(groups))
+        if self.command:
+            sends.append(self.run_command(groups))
+        if self.desktop:
+            sends.extend(notify_desktop(f"PingDog: {group['title']}", group["summary"]) for group in groups)
+        for outcome in await asyncio.gather(*sends, return_exceptions=True):
+            if isinstance(outcome, Exception):
+                self.failed += 1
+            else:
+                self.sent += 1
+
+    async def send_webhook(self, groups):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=self.ssl_context or True))
+        # "text" is what chat webhooks (Slack, Mattermost, ...) show
+        payload = {"text": "\n".join(group["summary"] for group in groups), "groups": groups}
+        async with self.session.post(
+            self.webhook, json=payload, timeout=aiohttp.ClientTimeout(total=SEND_TIMEOUT)
+        ) as response:
+            response.raise_for_status()
+
+    async def run_command(self, groups):
+        process = await asyncio.create_subprocess_shell(
+            self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            await asyncio.wait_for(process.communicate(json.dumps({"groups": groups}).encode()), SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            raise
+        if process.returncode:
+            raise RuntimeError(f"Alert command exited with {process.returncode}")
+
+
+def group_alerts(alerts):
+    """One group per state, URLs in the order their alerts came in."""
+    groups = {}
+    for alert in alerts:
+        groups.setdefault(alert["state"], []).append(alert)
+    result = []
+    for state, members in groups.items():
+        count = len(members)
+        title = f"{count} URL{'s' if count > 1 else ''} {LABELS[state]}"
+        names = ", ".join(alert["url"] for alert in members[:SUMMARY_URLS])
+        if count > SUMMARY_URLS:
+            names += f" and {count - SUMMARY_URLS} more"
+        result.append({"state": state, "title": title, "summary": f"{title}: {names}", "alerts": members})
+    return result
+
+
+async def notify_desktop(title, message):
+    """Desktop notification through notify-send (Linux) or osascript (macOS), nothing elsewhere."""
+    if sys.platform == "darwin":
+        quote = lambda text: json.dumps(text, ensure_ascii=False)
+        script = f"display notification {quote(message)} with title {quote(title)}"
+        args = ["osascript", "-e", script]
+    elif shutil.which("notify-send"):
+        args = ["notify-send", "--app-name=PingDog", title, message]
+    else:
+        return
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+    )
+    await asyncio.wait_for(process.wait(), SEND_TIMEOUT)
@@ -0,0 +1,35 @@
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+
+# Read once at import, setting the umask to read it is not thread safe
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def file_mode(file_path):
+    # The permissions of the file being replaced, or those open() would give a new one
+    try:
+        return stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+@contextmanager
+def replacing(file_path):
+    """
+    Yields the path of a temporary file next to file_path that replaces file_path when the
+    block ends, so file_path is never half written and a failure leaves it as it was.
+    The new file gets the permissions of the one it replaces.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield temp_path
+        # mkstemp creates the file readable by its owner only
+        os.chmod(temp_path, file_mode(file_path))
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -0,0 +1,75 @@
+import queue
+import threading
+import time
+
+
+class BatchWriter:
+    # Errors of _write that drop the batch instead of stopping the thread
+    errors = (OSError,)
+
+    def __init__(self, name, flush_interval=1.0, batch_size=1000):
+        """
+        Hands (url, result) pairs from the event loop to a background thread, which passes them
+        to _write in batches. Subclasses set up what _write needs before calling this, it starts
+        the thread.
+        name: str, name of the thread
+        flush_interval: float, max seconds a result waits before it is written
+        batch_size: int, results written at once
+        """
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue = queue.SimpleQueue()
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def __call__(self, url, result):
+        # Called on the event loop, must never block
+        self.queue.put((url, result))
+
+    def command(self, value):
+        """Ends the batch, _write gets value along with the results queued before it."""
+        self.queue.put((None, value))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        self._open()
+        running = True
+        while running:
+            batch = []
+            command = None
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                if item[0] is None:
+                    command = item[1]
+                    break
+                batch.append(item)
+            try:
+                if batch or command is not None:
+                    self._write(batch, command)
+                self._after_batch()
+            except self.errors:
+                self.dropped += len(batch)
+        self._close()
+
+    def _open(self):
+        """Runs on the thread before the first batch."""
+
+    def _write(self, batch, command):
+        raise NotImplementedError
+
+    def _after_batch(self):
+        """Runs on the thread after every batch, also when nothing came in."""
+
+    def _close(self):
+        """Runs on the thread after the last batch."""
@@ -0,0 +1,287 @@
+import argparse
+import asyncio
+import gc
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from aiohttp import web
+from config import PingDogConfig
+from engine import ProbeEngine
+from instrument import LoopLagMonitor
+
+
+class ServerFarm:
+    def __init__(self, servers=10, latency=0.01, error_rate=0.0, slow_tls=5.0):
+        """
+        Local stand-ins for the monitored endpoints.
+        servers: int, number of HTTP servers, each on its own port (so per-host limits apply per server)
+        latency: float, mean seconds a response is delayed by (exponentially distributed)
+        error_rate: float, fraction of responses that are 500s
+        slow_tls: float, seconds the TLS stand-in waits before dropping a connection
+        Every HTTP server also has /hang, which never answers.
+        """
+        self.servers = servers
+        self.latency = latency
+        self.error_rate = error_rate
+        self.slow_tls = slow_tls
+        self.runners = []
+        self.ports = []
+        self.tls_server = None
+        self.tls_port = None
+
+    async def handle(self, request):
+        if self.latency:
+            await asyncio.sleep(random.expovariate(1 / self.latency))
+        if random.random() < self.error_rate:
+            return web.Response(status=500, text="error")
+        return web.Response(text="ok")
+
+    async def handle_hang(self, request):
+        await asyncio.Event().wait()
+
+    async def handle_slow_tls(self, reader, writer):
+        # Accepts the connection but never answers the ClientHello
+        try:
+            await asyncio.sleep(self.slow_tls)
+        finally:
+            writer.close()
+
+    async def start(self):
+        for _ in range(self.servers):
+            app = web.Application()
+            app.router.add_get("/hang", self.handle_hang)
+            app.router.add_get("/{tail:.*}", self.handle)
+            runner = web.AppRunner(app, access_log=None, handler_cancellation=True)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0, backlog=4096)
+            await site.start()
+            self.runners.append(runner)
+            self.ports.append(site._server.sockets[0].getsockname()[1])
+        self.tls_server = await asyncio.start_server(self.handle_slow_tls, "127.0.0.1", 0, backlog=4096)
+        self.tls_port = self.tls_server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for runner in self.runners:
+            await runner.cleanup()
+        self.tls_server.close()
+
+    def urls(self, count, hanging=0.0, slow_tls=0.0):
+        """Returns `count` URLs spread over the servers, with the given fractions hanging or stuck in TLS."""
+        urls = {}
+        for i in range(count):
+            pick = random.random()
+            if pick < hanging:
+                url = f"http://127.0.0.1:{self.ports[i % self.servers]}/hang?{i}"
+            elif pick < hanging + slow_tls:
+                url = f"https://127.0.0.1:{self.tls_port}/{i}"
+            else:
+                url = f"http://127.0.0.1:{self.ports[i % self.servers]}/{i}"
+            urls[url] = None
+        return urls
+
+
+def make_config(directory, args):
+    config = PingDogConfig(os.path.join(directory, "config.yml"))
+    # Only the checks themselves are measured
+    config.log_file = ""
+    config.history_db = ""
+    config.timeout = args.timeout
+    config.concurrency = args.concurrency
+    config.workers = args.workers
+    config.flush()
+    return config
+
+
+def fake_result(i):
+    return {
+        "status": 200,
+        "response_time": 0.001 * (i % 100),
+        "error": None,
+        "last_checked": time.time(),
+        "reused": True,
+        "dns": None,
+        "connect": None,
+        "ttfb": 0.001,
+        "up": True,
+    }
+
+
+async def bench_checks(farm, config, count, args):
+    """Runs one full cycle through the engine and reports throughput and event loop lag."""
+    urls = farm.urls(count, args.hanging, args.slow_tls_rate)
+    engine = ProbeEngine(config, urls, 3600)
+    monitor = LoopLagMonitor(0.01)
+    monitor.start()
+    start = time.perf_counter()
+    await engine.start()
+    duration = time.perf_counter() - start
+    lag_max, lag_mean = monitor.take()
+    monitor.stop()
+    await engine.stop()
+    up = sum(1 for result in engine.metrics.values() if result["up"])
+    return {
+        "probes/s": count / duration,
+        "cycle s": duration,
+        "up %": 100 * up / count,
+        "lag max ms": lag_max * 1000,
+        "lag avg ms": lag_mean * 1000,
+    }
+
+
+def bench_memory(farm, config, count, args):
+    """Memory the engine keeps per URL once every URL has a result."""
+    urls = farm.urls(count, args.hanging, args.slow_tls_rate)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    engine = ProbeEngine(config, urls, 3600)
+    for i, url in enumerate(engine.urls):
+        engine.record(url, fake_result(i))
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {"mem/url KB": used / count / 1024}
+
+
+async def bench_ui(farm, config, count, args):
+    """Times building the table, repainting every row, the frame that follows, sorting and moving rows."""
+    from PingDogApp import PingDog
+    urls = farm.urls(count, args.hanging, args.slow_tls_rate)
+    app = PingDog(config, {}, 3600)
+    async with app.run_test(size=(160, 50)) as pilot:
+        await pilot.pause()
+        start = time.perf_counter()
+        app.update_table(added=app.engine.add_many(urls))
+        await pilot.pause()
+        build = time.perf_counter() - start
+        # Results are recorded without network traffic, so only the UI is measured
+        for i, url in enumerate(app.engine.urls):
+            app.engine.record(url, fake_result(i))
+        start = time.perf_counter()
+        app.flush_rows()
+        rows = time.perf_counter() - start
+        await pilot.pause()
+        frame = time.perf_counter() - start - rows
+        start = time.perf_counter()
+        app.sort_table("response_time", False)
+        sort = time.perf_counter() - start
+        # New response times move rows in the sorted table
+        for i, url in enumerate(app.engine.urls):
+            app.engine.record(url, fake_result(i + 1))
+        app.flush_rows()
+        start = time.perf_counter()
+        app.place_rows()
+        place = time.perf_counter() - start
+    return {"table build s": build, "row update s": rows, "frame s": frame, "sort s": sort, "row move s": place}
+
+
+def import_time():
+    """Seconds a fresh interpreter takes to import the TUI."""
+    code = "import time; start = time.perf_counter(); import PingDogApp; print(time.perf_counter() - start)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    ).stdout
+    return float(output)
+
+
+async def bench_startup(farm, config, count, args, imported):
+    """
+    Time to the first frame of the TUI (counting `imported`, the import time) and to the end
+    of the first check cycle, which runs behind the first frame.
+    """
+    from PingDogApp import PingDog
+
+    class TimedPingDog(PingDog):
+        # Textual sends Ready once the first frame is on screen
+        def on_ready(self):
+            self.ready_at = time.perf_counter()
+
+    urls = farm.urls(count, args.hanging, args.slow_tls_rate)
+    start = time.perf_counter()
+    app = TimedPingDog(config, urls, 3600)
+    app.ready_at = None
+    async with app.run_test(size=(160, 50)):
+        # Pilot.pause() would also wait for the rows and checks that come after the first frame
+        while app.ready_at is None:
+            await asyncio.sleep(0.01)
+        first_frame = imported + app.ready_at - start
+        scheduler = app.engine.scheduler
+        while scheduler is None or scheduler.last_cycle_duration is None:
+            await asyncio.sleep(0.01)
+            scheduler = app.engine.scheduler
+        first_cycle = imported + time.perf_counter() - start
+    return {"first frame s": first_frame, "first cycle s": first_cycle}
+
+
+def print_report(reports, columns):
+    widths = [max(len(column), 10) for column in columns]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for report in reports:
+        cells = []
+        for column, width in zip(columns, widths):
+            value = report.get(column)
+            if value is None:
+                cells.append("-".rjust(width))
+            elif isinstance(value, int):
+                cells.append(str(value).rjust(width))
+            else:
+                cells.append(f"{value:.3f}".rjust(width))
+        print("  ".join(cells))
+
+
+async def main(args):
+    farm = ServerFarm(args.servers, args.latency, args.error_rate, args.timeout * 2)
+    await farm.start()
+    reports = []
+    imported = import_time() if args.startup else 0.0
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            config = make_config(directory, args)
+            for count in args.urls:
+                report = {"urls": count}
+                report.update(await bench_checks(farm, config, count, args))
+                report.update(bench_memory(farm, config, count, args))
+                if args.ui:
+                    report.update(await bench_ui(farm, config, count, args))
+                if args.startup:
+                    report.update(await bench_startup(farm, config, count, args, imported))
+                reports.append(report)
+                print(f"{count} URLs done", flush=True)
+    finally:
+        await farm.stop()
+    columns = ["urls", "probes/s", "cycle s", "up %", "lag max ms", "lag avg ms", "mem/url KB"]
+    if args.ui:
+        columns += ["table build s", "row update s", "frame s", "sort s", "row move s"]
+    if args.startup:
+        columns += ["first frame s", "first cycle s"]
+    print_report(reports, columns)
+    if args.startup:
+        slow = [report["urls"] for report in reports if report["first frame s"] > args.first_frame_target]
+        if slow:
+            print(f"First frame later than the {args.first_frame_target}s target with {', '.join(map(str, slow))} URLs")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="PingDog benchmark - checks URLs served by local stand-in servers"
+    )
+    parser.add_argument("--urls", type=int, nargs="+", default=[100, 1000, 10000], help="URL counts to run (default: 100 1000 10000)")
+    parser.add_argument("--servers", type=int, default=10, help="Number of local HTTP servers (default: 10)")
+    parser.add_argument("--latency", type=float, default=0.01, help="Mean response delay in seconds (default: 0.01)")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Fraction of 500 responses (default: 0.01)")
+    parser.add_argument("--hanging", type=float, default=0.0, help="Fraction of URLs that never answer (default: 0)")
+    parser.add_argument("--slow-tls-rate", type=float, default=0.0, help="Fraction of URLs whose TLS handshake never completes (default: 0)")
+    parser.add_argument("--timeout", type=float, default=2, help="Check timeout in seconds (default: 2)")
+    parser.add_argument("--concurrency", type=int, default=100, help="Checks running at once (default: 100)")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: 0)")
+    parser.add_argument("--ui", action="store_true", help="Also time the table (runs the TUI headless)")
+    parser.add_argument("--startup", action="store_true", help="Also time the TUI's first frame and first cycle, including imports (runs the TUI headless)")
+    parser.add_argument("--first-frame-target", type=float, default=1.5, help="With --startup, exit with status 1 if the first frame takes longer (default: 1.5)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
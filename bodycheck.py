@@ -0,0 +1,135 @@
+import hashlib
+import json
+import re
+
+# Bytes of the previous chunks a regex is also run over, so matches spanning chunks are found
+REGEX_OVERLAP = 4096
+
+
+def parse_json_check(value):
+    # "path" (must exist) or "path=value"; keys separated by dots, list items by index: "checks.0.state=ok"
+    path, sep, expected = str(value).partition("=")
+    path = path.strip().removeprefix("$").strip(".")
+    if not path:
+        raise ValueError(f"Invalid JSON check '{value}'")
+    keys = tuple(int(key) if key.isdigit() else key for key in path.split("."))
+    return path, keys, expected.strip() if sep else None
+
+
+def json_value(document, keys):
+    # Raises LookupError (or TypeError) if the path doesn't exist
+    for key in keys:
+        if isinstance(document, list) and not isinstance(key, int):
+            raise KeyError(key)
+        document = document[key]
+    return document
+
+
+class BodyCheck:
+    def __init__(self, contains=None, matches=None, json_check=None, sha256=None, max_size=None):
+        """
+        Checks on the body of a GET response, compiled once per Target.
+        contains: str the body must contain
+        matches: str, regular expression the body must match (within REGEX_OVERLAP bytes)
+        json_check: str, "path" or "path=value" the body, parsed as JSON, must have
+        sha256: str, hex digest the whole body must hash to
+        max_size: int, bytes the body may have at most
+        """
+        self.contains = contains
+        self.needle = contains.encode() if contains else None
+        try:
+            self.pattern = re.compile(matches.encode()) if matches else None
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression '{matches}': {e}") from None
+        self.json = parse_json_check(json_check) if json_check else None
+        if sha256 and not re.fullmatch(r"[0-9a-fA-F]{64}", sha256):
+            raise ValueError(f"Invalid SHA-256 digest '{sha256}'")
+        self.sha256 = sha256.lower() if sha256 else None
+        self.max_size = max_size
+        # Checks that need every byte of the body; without them reading stops at the matches
+        self.whole = bool(self.json or self.sha256 or max_size)
+        self.overlap = max(len(self.needle) - 1 if self.needle else 0, REGEX_OVERLAP if self.pattern else 0)
+
+    def scan(self, limit, content_length=None):
+        return BodyScan(self, limit, content_length)
+
+
+class BodyScan:
+    __slots__ = ("check", "limit", "size", "tail", "found", "matched", "hash", "buffer", "truncated", "error", "done")
+
+    def __init__(self, check, limit, content_length=None):
+        """
+        Runs a BodyCheck over the chunks of one response as they arrive. Only a regex/substring
+        overlap, the running hash and (for JSON checks) the body itself are kept, and at most
+        limit bytes are read.
+        """
+        self.check = check
+        self.limit = limit
+        self.size = 0
+        self.tail = b""
+        self.found = check.needle is None
+        self.matched = check.pattern is None
+        self.hash = hashlib.sha256() if check.sha256 else None
+        self.buffer = bytearray() if check.json else None
+        self.truncated = False
+        self.error = None
+        self.done = False
+        if check.max_size and content_length is not None and content_length > check.max_size:
+            # Content-Length already tells, nothing needs to be read
+            self.error = f"Body over {check.max_size} bytes"
+            self.done = True
+
+    def feed(self, chunk):
+        """Scans the next chunk, returns True once the rest of the body doesn't matter."""
+        check = self.check
+        if self.size + len(chunk) > self.limit:
+            chunk = chunk[:self.limit - self.size]
+            self.truncated = True
+        self.size += len(chunk)
+        if check.max_size and self.size > check.max_size:
+            self.error = f"Body over {check.max_size} bytes"
+            self.done = True
+            return True
+        if not (self.found and self.matched):
+            window = self.tail + chunk if self.tail else chunk
+            if not self.found and check.needle in window:
+                self.found = True
+            if not self.matched and check.pattern.search(window):
+                self.matched = True
+            self.tail = window[-check.overlap:] if check.overlap else b""
+        if self.hash is not None:
+            self.hash.update(chunk)
+        if self.buffer is not None:
+            self.buffer += chunk
+        self.done = self.truncated or (self.found and self.matched and not check.whole)
+        return self.done
+
+    def result(self):
+        """None if every check passed, else what failed."""
+        if self.error is not None:
+            return self.error
+        check = self.check
+        if check.whole and self.truncated:
+            return f"Body over the {self.limit} byte limit"
+        read = f" in the first {self.limit} bytes" if self.truncated else ""
+        if not self.found:
+            return f"'{check.contains}' not found{read}"
+        if not self.matched:
+            return f"No match for /{check.pattern.pattern.decode()}/{read}"
+        if self.hash is not None and self.hash.hexdigest() != check.sha256:
+            return "Body SHA-256 differs"
+        if self.buffer is not None:
+            path, keys, expected = check.json
+            try:
+                document = json.loads(self.buffer)
+            except ValueError:
+                return "Body is not JSON"
+            try:
+                value = json_value(document, keys)
+            except (LookupError, TypeError):
+                return f"No {path} in JSON"
+            if expected is not None:
+                actual = value if isinstance(value, str) else json.dumps(value)
+                if actual != expected:
+                    return f"{path} is {actual}, expected {expected}"
+        return None
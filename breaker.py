@@ -0,0 +1,103 @@
+import time
+from urllib.parse import urlsplit
+
+
+class HostCircuit:
+    __slots__ = ("failures", "state", "open_until", "cooldown", "trial", "trial_until")
+
+    def __init__(self, cooldown):
+        self.failures = 0
+        self.state = "closed"
+        self.open_until = 0.0
+        self.cooldown = cooldown
+        # URL of the half-open circuit's trial check and when it is given up on
+        self.trial = None
+        self.trial_until = 0.0
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=3, cooldown=30, max_backoff=8):
+        """
+        Tracks failures per URL and per host.
+        threshold: int, consecutive failures without a response that open a host's circuit (0 = never)
+        cooldown: float, seconds an open circuit waits before letting one trial check through;
+                  doubled (up to 8x) every time the trial fails
+        max_backoff: int, maximum factor a failing URL's interval is stretched by
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_backoff = max_backoff
+        self.hosts = {}
+        self.failures = {}
+        self.host_of = {}
+
+    def host(self, url):
+        host = self.host_of.get(url)
+        if host is None:
+            # Services on different ports of one machine fail independently
+            netloc = urlsplit(url if "://" in url else f"tcp://{url}").netloc.rpartition("@")[2]
+            host = self.host_of[url] = netloc.lower() or url
+        return host
+
+    def check(self, url):
+        """Returns None if the URL may be checked, otherwise why it fails fast."""
+        circuit = self.hosts.get(self.host(url))
+        if circuit is None or circuit.state == "closed":
+            return None
+        now = time.monotonic()
+        if circuit.state == "open" and now < circuit.open_until:
+            return "Circuit open, host down"
+        if circuit.state == "half-open" and now < circuit.trial_until:
+            return "Circuit half-open, waiting for trial check"
+        # This check is the trial, siblings keep failing fast until it is back. A trial whose
+        # result never came (cancelled, or its URL unscheduled) is replaced after cooldown
+        circuit.state = "half-open"
+        circuit.trial = url
+        circuit.trial_until = now + circuit.cooldown
+        return None
+
+    def record(self, url, result):
+        """Updates the failure counts and returns the factor the URL's interval should be stretched by."""
+        if result.get("circuit"):
+            return self.backoff(url)
+        if result["up"]:
+            self.failures.pop(url, None)
+        else:
+            self.failures[url] = self.failures.get(url, 0) + 1
+
+        host = self.host(url)
+        circuit = self.hosts.get(host)
+        if result["error"] is None or result["status"] is not None:
+            # The host answered, even if with an error status or an unexpected body
+            if circuit is not None:
+                del self.hosts[host]
+        elif self.threshold:
+            if circuit is None:
+                circuit = self.hosts[host] = HostCircuit(self.cooldown)
+            circuit.failures += 1
+            if circuit.state == "half-open":
+                circuit.cooldown = min(circuit.cooldown * 2, self.cooldown * 8)
+                self._open(circuit)
+            elif circuit.state == "closed" and circuit.failures >= self.threshold:
+                self._open(circuit)
+        return self.backoff(url)
+
+    def _open(self, circuit):
+        circuit.state = "open"
+        circuit.trial = None
+        circuit.open_until = time.monotonic() + circuit.cooldown
+
+    def backoff(self, url):
+        failures = self.failures.get(url, 0)
+        if failures < 2:
+            return 1
+        return min(2 ** (failures - 1), self.max_backoff)
+
+    def forget(self, url):
+        self.failures.pop(url, None)
+        circuit = self.hosts.get(self.host_of.pop(url, None))
+        if circuit is not None and circuit.trial == url:
+            # Its result will never come, the next check of the host is the new trial
+            circuit.state = "open"
+            circuit.trial = None
+            circuit.open_until = 0.0
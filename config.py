@@ -1,10 +1,23 @@
-import yaml
+import asyncio
+import math
 import os
+import threading
+import yaml
+from atomicfile import replacing
 
 class Config:
+    # Seconds changes are held back so a burst of them is written once
+    FLUSH_DELAY = 1.0
+
     def __init__(self, yaml_path):
         self.yaml_path = yaml_path
         self.data = {}
+        self.dirty = False
+        self.version = 0
+        self.saved_version = 0
+        self.mtime = None
+        self.flush_handle = None
+        self.write_lock = threading.Lock()
         if os.path.exists(yaml_path):
             self.load()
         else:
@@ -14,17 +27,71 @@ class Config:
     def load(self):
         with open(self.yaml_path, 'r', encoding='utf-8') as f:
             self.data = yaml.safe_load(f) or {}
+        self.mtime = os.stat(self.yaml_path).st_mtime_ns
 
     def save(self):
-        with open(self.yaml_path, 'w', encoding='utf-8') as f:
-            yaml.safe_dump(self.data, f, default_flow_style=False, allow_unicode=True)
+        self.dirty = False
+        self._write(dict(self.data), self.version)
+
+    def _write(self, data, version):
+        # Written to a temporary file and renamed, so the file is never half written
+        with self.write_lock:
+            if version < self.saved_version:
+                return
+            with replacing(self.yaml_path) as temp_path:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    yaml.safe_dump(data, f, default_flow_style=False, allow_unicode=True)
+            self.saved_version = version
+            self.mtime = os.stat(self.yaml_path).st_mtime_ns
+
+    def mark_dirty(self):
+        """Schedules a write FLUSH_DELAY seconds from now, or writes right away outside an event loop."""
+        self.dirty = True
+        self.version += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        if self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.FLUSH_DELAY, self._flush_later, loop)
+
+    def _flush_later(self, loop):
+        self.flush_handle = None
+        if self.dirty:
+            self.dirty = False
+            loop.run_in_executor(None, self._write, dict(self.data), self.version)
+
+    def flush(self):
+        """Writes pending changes now, call before exiting."""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.dirty:
+            self.save()
+
+    def reload_if_changed(self):
+        """Reloads the file if something else changed it, returns True if it did."""
+        try:
+            mtime = os.stat(self.yaml_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self.mtime or self.dirty:
+            return False
+        try:
+            self.load()
+        except (OSError, yaml.YAMLError):
+            # Half edited, try again on the next change
+            self.mtime = mtime
+            return False
+        return True
 
     def get(self, key, default=None):
         return self.data.get(key, default)
 
     def set(self, key, value):
         self.data[key] = value
-        self.save()
+        self.mark_dirty()
 
     def __repr__(self):
         return f"Config({self.yaml_path}): {self.data}"
@@ -34,10 +101,68 @@ class PingDogConfig(Config):
     DEFAULTS = {
         "theme": "textual-dark",    # default theme
         "timeout": 2,               # seconds
-        "log_file": "pingdog.log",  # default log file
+        "log_file": "pingdog.log",  # result log, relative to this file's folder ('' = disabled)
+        "log_format": "jsonl",      # 'jsonl' or 'csv'
+        "log_max_bytes": 10000000,  # rotate the log past this size (0 = never)
+        "log_rotate_interval": 0,   # rotate the log every this many seconds (0 = never)
+        "log_backups": 5,           # rotated log files kept
+        "log_flush_interval": 1.0,  # max seconds a result waits before it is written
+        "pool_size": 100,           # max open connections in total
+        "pool_per_host": 10,        # max open connections per host (0 = no limit)
+        "keepalive_timeout": 30,    # seconds an idle connection is kept open
+        "dns_cache_ttl": 300,       # seconds resolved hosts are cached
+        "concurrency": 100,         # max probes running at once
+        "workers": 0,               # worker processes running the probes (0 = in the main process)
+        "cycle_overlap": "coalesce",  # 'skip' or 'coalesce' a check due while the previous one is running
+        "jitter": 0.1,              # fraction of the interval each check is randomly shifted by
+        "refresh_rate": 10,         # max table repaints per second
+        "history_size": 500,        # checks kept per URL for uptime and percentiles
+        "history_db": "history.db", # check history database, relative to this file's folder ('' = disabled)
+        "history_retention": 7,     # days checks are kept in the database (0 = forever)
+        "metrics_host": "127.0.0.1",  # address of the Prometheus endpoint
+        "metrics_port": 0,          # port of the Prometheus endpoint (0 = disabled)
+        "backoff_max": 8,           # max factor a failing URL's interval is stretched by
+        "breaker_threshold": 3,     # failed checks in a row that take a host down (0 = never)
+        "breaker_cooldown": 30,     # seconds before a down host is checked again
+        "alert_failures": 3,        # failed checks in a row before a URL is reported down (0 = no alerts)
+        "alert_recoveries": 2,      # good checks in a row before a down URL is reported back up
+        "alert_slow": 0,            # seconds a response may take before the URL is reported degraded (0 = never)
+        "alert_flap_changes": 4,    # state changes within alert_flap_window that hold a URL's alerts back
+        "alert_flap_window": 600,   # seconds
+        "alert_batch_interval": 5,  # seconds alerts are collected and grouped before they are sent
+        "alert_webhook": "",        # URL alerts are POSTed to as JSON ('' = disabled)
+        "alert_command": "",        # shell command run with alerts as JSON on stdin ('' = disabled)
+        "alert_desktop": False,     # desktop notifications (notify-send or osascript)
+        "body_limit": 262144,       # max bytes of a response body read for body checks
+    }
+
+    # Settings that only take one of a few values
+    CHOICES = {
+        "log_format": ("jsonl", "csv"),
+        "cycle_overlap": ("skip", "coalesce"),
+    }
+    # Numeric settings that count something and must be whole numbers
+    COUNTS = {
+        "log_max_bytes", "log_backups", "pool_size", "pool_per_host", "concurrency", "workers",
+        "history_size", "metrics_port", "breaker_threshold", "alert_failures", "alert_recoveries",
+        "alert_flap_changes", "body_limit",
+    }
+    # Numeric settings that must be above 0; the others may be 0 (mostly meaning off) but not less
+    POSITIVE = {
+        "timeout", "log_flush_interval", "pool_size", "keepalive_timeout", "concurrency", "refresh_rate",
+        "history_size", "breaker_cooldown", "alert_recoveries", "alert_flap_window",
+        "alert_batch_interval", "body_limit",
+    }
+    # Other limits of numeric settings, as (lowest, highest or None)
+    BOUNDS = {
+        "jitter": (0, 1),
+        "backoff_max": (1, None),
+        "metrics_port": (0, 65535),
     }
 
     def __init__(self, yaml_path):
+        # Settings of the last load that were invalid and replaced, as messages
+        self.problems = []
         super().__init__(yaml_path)
         # Set missing defaults
         changed = False
@@ -48,6 +173,58 @@ class PingDogConfig(Config):
         if changed:
             self.save()
 
+    def load(self):
+        previous = self.data
+        super().load()
+        self.problems = self.check_values(previous)
+
+    def check_values(self, previous):
+        """
+        Converts numbers written as strings and replaces values of the wrong type or out of
+        range with the one in previous (or the default). Returns a message per replaced value.
+        """
+        problems = []
+        for key, default in self.DEFAULTS.items():
+            if key not in self.data:
+                continue
+            value = self.data[key]
+            try:
+                self.data[key] = self.convert(key, value, default)
+            except (TypeError, ValueError):
+                fallback = previous.get(key, default)
+                self.data[key] = fallback
+                problems.append(f"Invalid {key}: {value!r}, using {fallback!r}")
+        return problems
+
+    def convert(self, key, value, default):
+        if isinstance(default, bool):
+            if not isinstance(value, bool):
+                raise TypeError(key)
+        elif isinstance(default, (int, float)):
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise TypeError(key)
+            if isinstance(value, str):
+                value = float(value)
+                if value.is_integer():
+                    value = int(value)
+            if not math.isfinite(value):
+                raise ValueError(key)
+            if key in self.COUNTS:
+                if value != int(value):
+                    raise ValueError(key)
+                value = int(value)
+            lowest, highest = self.BOUNDS.get(key, (0, None))
+            if value < lowest or (highest is not None and value > highest):
+                raise ValueError(key)
+            if key in self.POSITIVE and value <= 0:
+                raise ValueError(key)
+        elif isinstance(default, str):
+            if not isinstance(value, str):
+                raise TypeError(key)
+            if key in self.CHOICES and value not in self.CHOICES[key]:
+                raise ValueError(key)
+        return value
+
     @property
     def theme(self):
         return self.data.get("theme", self.DEFAULTS["theme"])
@@ -55,7 +232,7 @@ class PingDogConfig(Config):
     @theme.setter
     def theme(self, value):
         self.data["theme"] = value
-        self.save()
+        self.mark_dirty()
 
     @property
     def timeout(self):
@@ -64,7 +241,7 @@ class PingDogConfig(Config):
     @timeout.setter
     def timeout(self, value):
         self.data["timeout"] = value
-        self.save()
+        self.mark_dirty()
 
     @property
     def log_file(self):
@@ -73,4 +250,292 @@ class PingDogConfig(Config):
     @log_file.setter
     def log_file(self, value):
         self.data["log_file"] = value
-        self.save()
+        self.mark_dirty()
+
+    @property
+    def pool_size(self):
+        return self.data.get("pool_size", self.DEFAULTS["pool_size"])
+
+    @pool_size.setter
+    def pool_size(self, value):
+        self.data["pool_size"] = value
+        self.mark_dirty()
+
+    @property
+    def pool_per_host(self):
+        return self.data.get("pool_per_host", self.DEFAULTS["pool_per_host"])
+
+    @pool_per_host.setter
+    def pool_per_host(self, value):
+        self.data["pool_per_host"] = value
+        self.mark_dirty()
+
+    @property
+    def keepalive_timeout(self):
+        return self.data.get("keepalive_timeout", self.DEFAULTS["keepalive_timeout"])
+
+    @keepalive_timeout.setter
+    def keepalive_timeout(self, value):
+        self.data["keepalive_timeout"] = value
+        self.mark_dirty()
+
+    @property
+    def dns_cache_ttl(self):
+        return self.data.get("dns_cache_ttl", self.DEFAULTS["dns_cache_ttl"])
+
+    @dns_cache_ttl.setter
+    def dns_cache_ttl(self, value):
+        self.data["dns_cache_ttl"] = value
+        self.mark_dirty()
+
+    @property
+    def concurrency(self):
+        return self.data.get("concurrency", self.DEFAULTS["concurrency"])
+
+    @concurrency.setter
+    def concurrency(self, value):
+        self.data["concurrency"] = value
+        self.mark_dirty()
+
+    @property
+    def cycle_overlap(self):
+        return self.data.get("cycle_overlap", self.DEFAULTS["cycle_overlap"])
+
+    @cycle_overlap.setter
+    def cycle_overlap(self, value):
+        self.data["cycle_overlap"] = value
+        self.mark_dirty()
+
+    @property
+    def jitter(self):
+        return self.data.get("jitter", self.DEFAULTS["jitter"])
+
+    @jitter.setter
+    def jitter(self, value):
+        self.data["jitter"] = value
+        self.mark_dirty()
+
+    @property
+    def refresh_rate(self):
+        return self.data.get("refresh_rate", self.DEFAULTS["refresh_rate"])
+
+    @refresh_rate.setter
+    def refresh_rate(self, value):
+        self.data["refresh_rate"] = value
+        self.mark_dirty()
+
+    @property
+    def history_size(self):
+        return self.data.get("history_size", self.DEFAULTS["history_size"])
+
+    @history_size.setter
+    def history_size(self, value):
+        self.data["history_size"] = value
+        self.mark_dirty()
+
+    @property
+    def log_format(self):
+        return self.data.get("log_format", self.DEFAULTS["log_format"])
+
+    @log_format.setter
+    def log_format(self, value):
+        self.data["log_format"] = value
+        self.mark_dirty()
+
+    @property
+    def log_max_bytes(self):
+        return self.data.get("log_max_bytes", self.DEFAULTS["log_max_bytes"])
+
+    @log_max_bytes.setter
+    def log_max_bytes(self, value):
+        self.data["log_max_bytes"] = value
+        self.mark_dirty()
+
+    @property
+    def log_rotate_interval(self):
+        return self.data.get("log_rotate_interval", self.DEFAULTS["log_rotate_interval"])
+
+    @log_rotate_interval.setter
+    def log_rotate_interval(self, value):
+        self.data["log_rotate_interval"] = value
+        self.mark_dirty()
+
+    @property
+    def log_backups(self):
+        return self.data.get("log_backups", self.DEFAULTS["log_backups"])
+
+    @log_backups.setter
+    def log_backups(self, value):
+        self.data["log_backups"] = value
+        self.mark_dirty()
+
+    @property
+    def log_flush_interval(self):
+        return self.data.get("log_flush_interval", self.DEFAULTS["log_flush_interval"])
+
+    @log_flush_interval.setter
+    def log_flush_interval(self, value):
+        self.data["log_flush_interval"] = value
+        self.mark_dirty()
+
+    @property
+    def metrics_host(self):
+        return self.data.get("metrics_host", self.DEFAULTS["metrics_host"])
+
+    @metrics_host.setter
+    def metrics_host(self, value):
+        self.data["metrics_host"] = value
+        self.mark_dirty()
+
+    @property
+    def metrics_port(self):
+        return self.data.get("metrics_port", self.DEFAULTS["metrics_port"])
+
+    @metrics_port.setter
+    def metrics_port(self, value):
+        self.data["metrics_port"] = value
+        self.mark_dirty()
+
+    @property
+    def workers(self):
+        return self.data.get("workers", self.DEFAULTS["workers"])
+
+    @workers.setter
+    def workers(self, value):
+        self.data["workers"] = value
+        self.mark_dirty()
+
+    @property
+    def backoff_max(self):
+        return self.data.get("backoff_max", self.DEFAULTS["backoff_max"])
+
+    @backoff_max.setter
+    def backoff_max(self, value):
+        self.data["backoff_max"] = value
+        self.mark_dirty()
+
+    @property
+    def breaker_threshold(self):
+        return self.data.get("breaker_threshold", self.DEFAULTS["breaker_threshold"])
+
+    @breaker_threshold.setter
+    def breaker_threshold(self, value):
+        self.data["breaker_threshold"] = value
+        self.mark_dirty()
+
+    @property
+    def breaker_cooldown(self):
+        return self.data.get("breaker_cooldown", self.DEFAULTS["breaker_cooldown"])
+
+    @breaker_cooldown.setter
+    def breaker_cooldown(self, value):
+        self.data["breaker_cooldown"] = value
+        self.mark_dirty()
+
+    @property
+    def history_db(self):
+        return self.data.get("history_db", self.DEFAULTS["history_db"])
+
+    @history_db.setter
+    def history_db(self, value):
+        self.data["history_db"] = value
+        self.mark_dirty()
+
+    @property
+    def history_retention(self):
+        return self.data.get("history_retention", self.DEFAULTS["history_retention"])
+
+    @history_retention.setter
+    def history_retention(self, value):
+        self.data["history_retention"] = value
+        self.mark_dirty()
+
+    @property
+    def alert_failures(self):
+        return self.data.get("alert_failures", self.DEFAULTS["alert_failures"])
+
+    @alert_failures.setter
+    def alert_failures(self, value):
+        self.data["alert_failures"] = value
+        self.mark_dirty()
+
+    @property
+    def alert_recoveries(self):
+        return self.data.get("alert_recoveries", self.DEFAULTS["alert_recoveries"])
+
+    @alert_recoveries.setter
+    def alert_recoveries(self, value):
+        self.data["alert_recoveries"] = value
+        self.mark_dirty()
+
+    @property
+    def alert_slow(self):
+        return self.data.get("alert_slow", self.DEFAULTS["alert_slow"])
+
+    @alert_slow.setter
+    def alert_slow(self, value):
+        self.data["alert_slow"] = value
+        self.mark_dirty()
+
+    @property
+    def alert_flap_changes(self):
+        return self.data.get("alert_flap_changes", self.DEFAULTS["alert_flap_changes"])
+
+    @alert_flap_changes.setter
+    def alert_flap_changes(self, value):
+        self.data["alert_flap_changes"] = value
+        self.mark_dirty()
+
+    @property
+    def alert_flap_window(self):
+        return self.data.get("alert_flap_window", self.DEFAULTS["alert_flap_window"])
+
+    @alert_flap_window.setter
+    def alert_flap_window(self, value):
+        self.data["alert_flap_window"] = value
+        self.mark_dirty()
+
+    @property
+    def alert_batch_interval(self):
+        return self.data.get("alert_batch_interval", self.DEFAULTS["alert_batch_interval"])
+
+    @alert_batch_interval.setter
+    def alert_batch_interval(self, value):
+        self.data["alert_batch_interval"] = value
+        self.mark_dirty()
+
+    @property
+    def alert_webhook(self):
+        return self.data.get("alert_webhook", self.DEFAULTS["alert_webhook"])
+
+    @alert_webhook.setter
+    def alert_webhook(self, value):
+        self.data["alert_webhook"] = value
+        self.mark_dirty()
+
+    @property
+    def alert_command(self):
+        return self.data.get("alert_command", self.DEFAULTS["alert_command"])
+
+    @alert_command.setter
+    def alert_command(self, value):
+        self.data["alert_command"] = value
+        self.mark_dirty()
+
+    @property
+    def alert_desktop(self):
+        return self.data.get("alert_desktop", self.DEFAULTS["alert_desktop"])
+
+    @alert_desktop.setter
+    def alert_desktop(self, value):
+        self.data["alert_desktop"] = value
+        self.mark_dirty()
+
+    @property
+    def body_limit(self):
+        return self.data.get("body_limit", self.DEFAULTS["body_limit"])
+
+    @body_limit.setter
+    def body_limit(self, value):
+        self.data["body_limit"] = value
+        self.mark_dirty()
@@ -0,0 +1,514 @@
+import asyncio
+import os
+import random
+import socket
+import ssl
+import sys
+import time
+from urllib.parse import urlsplit
+import certifi
+import aiohttp
+from scheduler import ProbeScheduler
+from history import History
+from resultlog import ResultLog
+from historystore import HistoryStore
+from instrument import LoopLagMonitor, memory_usage
+from breaker import CircuitBreaker
+from alerts import AlertManager
+from resolver import CachingResolver
+from registry import UrlRegistry
+from target import DEFAULT_PORTS, DEFAULT_TARGET
+
+ssl_context = ssl.create_default_context(cafile=certifi.where())
+
+# Seconds between checks of config.yml for outside edits
+CONFIG_POLL = 2.0
+
+# Fields of a check result, in the order they are packed between processes
+RESULT_FIELDS = ("status", "response_time", "error", "last_checked", "reused", "dns", "connect", "ttfb", "up", "cert_expires", "dns_error")
+
+async def on_connection_reuseconn(session, trace_config_ctx, params):
+    if trace_config_ctx.trace_request_ctx is not None:
+        trace_config_ctx.trace_request_ctx["reused"] = True
+
+def trace_mark(name):
+    # Stores the perf_counter time of a trace event in the request's trace dict
+    async def handler(session, trace_config_ctx, params):
+        if trace_config_ctx.trace_request_ctx is not None:
+            trace_config_ctx.trace_request_ctx[name] = time.perf_counter()
+    return handler
+
+def trace_span(trace, start, end):
+    if start in trace and end in trace:
+        return trace[end] - trace[start]
+    return None
+
+def create_session(config, resolver=None):
+    # resolver: CachingResolver shared with the tcp/tls checks, or aiohttp's own DNS cache if None
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_dns_resolvehost_start.append(trace_mark("dns_start"))
+    trace_config.on_dns_resolvehost_end.append(trace_mark("dns_end"))
+    trace_config.on_connection_create_start.append(trace_mark("connect_start"))
+    trace_config.on_connection_create_end.append(trace_mark("connect_end"))
+    trace_config.on_request_headers_sent.append(trace_mark("request_sent"))
+    trace_config.on_request_end.append(trace_mark("response_start"))
+    connector = aiohttp.TCPConnector(
+        ssl=ssl_context,
+        limit=config.pool_size,
+        limit_per_host=config.pool_per_host,
+        keepalive_timeout=config.keepalive_timeout,
+        ttl_dns_cache=config.dns_cache_ttl,
+        resolver=resolver,
+        use_dns_cache=resolver is None,
+    )
+    return aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+
+def dns_failure(error, start_time):
+    # A host name that didn't resolve, told apart from failed connections and requests
+    return {
+        "status": None,
+        "response_time": None,
+        "error": getattr(error, "strerror", None) or str(error) or type(error).__name__,
+        "last_checked": start_time,
+        "reused": False,
+        "up": False,
+        "dns_error": True,
+    }
+
+class ProbeEngine:
+    def __init__(self, config, urls, check_interval=30):
+        """
+        Owns the URL registry, the connection pool, the scheduler and the metric store.
+        Used by both the TUI and the headless mode.
+        urls: dict of url -> Target (or None for the defaults), as returned by read_urls_from_file
+        """
+        self.config = config
+        self.urls = UrlRegistry(urls)
+        self.check_interval = check_interval
+        self.metrics = {}
+        self.history = {}
+        self.listeners = []
+        self.config_listeners = []
+        self.watcher = None
+        self.cycle = None
+        self.lag = LoopLagMonitor()
+        self.session = None
+        self.scheduler = None
+        self.log = None
+        self.store = None
+        self.exporter = None
+        self.pool = None
+        self.resolver = None
+        self.send = None
+        self.breaker = CircuitBreaker(config.breaker_threshold, config.breaker_cooldown, config.backoff_max)
+        self.alerts = AlertManager(
+            failures=config.alert_failures,
+            recoveries=config.alert_recoveries,
+            slow=config.alert_slow,
+            flap_changes=config.alert_flap_changes,
+            flap_window=config.alert_flap_window,
+            batch_interval=config.alert_batch_interval,
+            webhook=config.alert_webhook,
+            command=config.alert_command,
+            desktop=config.alert_desktop,
+            ssl_context=ssl_context,
+        )
+        self.add_listener(self.alerts)
+
+    def add_listener(self, callback):
+        """callback: callable(url, result) invoked after each result is recorded"""
+        self.listeners.append(callback)
+
+    def add_config_listener(self, callback):
+        """
+        callback: callable(problems) invoked after config.yml was edited outside PingDog and reloaded,
+        problems: list of str, settings that were invalid or could not be applied
+        """
+        self.config_listeners.append(callback)
+
+    def data_path(self, file_path):
+        # Relative paths are kept next to config.yml
+        return os.path.join(os.path.dirname(self.config.yaml_path), os.path.expanduser(file_path))
+
+    async def restore(self):
+        """
+        Opens the history database and loads the last known state of every URL. Called by start() if needed.
+        Returns the URLs whose state was restored.
+        """
+        if self.store is not None or not self.config.history_db:
+            return []
+        # Opening the database and filling the histories stay off the event loop
+        loop = asyncio.get_running_loop()
+        path = self.data_path(self.config.history_db)
+        store = await loop.run_in_executor(None, HistoryStore, path, self.config.history_retention)
+        if self.store is not None:
+            # Another restore() won the race
+            await loop.run_in_executor(None, store.close)
+            return []
+        self.store = store
+        restored = await loop.run_in_executor(None, store.restore, list(self.urls), self.config.history_size)
+        for url, (result, history) in restored.items():
+            if url in self.urls and url not in self.metrics:
+                self.metrics[url] = result
+                self.history[url] = history
+        self.add_listener(store)
+        return list(restored)
+
+    async def start(self, wait=True):
+        """wait: return once the first check cycle has finished, otherwise it runs in the background"""
+        self.lag.start()
+        await self.restore()
+        if self.config.log_file:
+            self.log = ResultLog(
+                self.data_path(self.config.log_file),
+                format=self.config.log_format,
+                max_bytes=self.config.log_max_bytes,
+                rotate_interval=self.config.log_rotate_interval,
+                backups=self.config.log_backups,
+                flush_interval=self.config.log_flush_interval,
+            )
+            self.add_listener(self.log)
+        if self.config.metrics_port:
+            # aiohttp.web is only loaded when the exporter is enabled
+            from exporter import MetricsExporter
+            self.exporter = MetricsExporter(self, self.config.metrics_host, self.config.metrics_port)
+            self.add_listener(self.exporter)
+            await self.exporter.start()
+        if self.config.workers:
+            from workers import WorkerPool
+            self.pool = WorkerPool(self.config, self.config.workers)
+            self.pool.start()
+            self.send = lambda url: self.pool.probe(url, self.urls.target(url))
+        else:
+            self.resolver = CachingResolver(self.config.dns_cache_ttl)
+            self.session = create_session(self.config, self.resolver)
+            self.send = lambda url: self.check_url(self.session, url, self.urls.target(url))
+        self.scheduler = ProbeScheduler(
+            self.probe,
+            self.record,
+            concurrency=self.config.concurrency,
+            overlap=self.config.cycle_overlap,
+            jitter=self.config.jitter,
+        )
+        self.alerts.start()
+        self.sync_schedule()
+        if wait:
+            await self.first_cycle()
+        else:
+            self.cycle = asyncio.ensure_future(self.first_cycle())
+        self.watcher = asyncio.ensure_future(self.watch_config())
+
+    async def first_cycle(self):
+        # Checks every URL at once, regular checks take over when it is done
+        urls = list(self.urls)
+        await self.scheduler.run_cycle(urls)
+        # Due times picked before the cycle have passed by its end and would all fire at once.
+        # The next checks land between half and one and a half intervals after it instead,
+        # spread as evenly as random first checks
+        for url in urls:
+            interval = self.scheduler.intervals.get(url)
+            if interval is not None:
+                self.scheduler.schedule(url, interval, first=interval * random.uniform(0.5, 1.5))
+        self.scheduler.start()
+
+    async def stop(self):
+        self.lag.stop()
+        if self.watcher is not None:
+            self.watcher.cancel()
+        if self.cycle is not None:
+            self.cycle.cancel()
+        self.config.flush()
+        if self.scheduler is not None:
+            self.scheduler.cancel()
+        await self.alerts.stop()
+        if self.exporter is not None:
+            await self.exporter.stop()
+        if self.session is not None:
+            await self.session.close()
+        if self.resolver is not None:
+            await self.resolver.close()
+        if self.pool is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.pool.stop)
+        if self.log is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.log.close)
+        if self.store is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.store.close)
+
+    async def watch_config(self):
+        while True:
+            await asyncio.sleep(CONFIG_POLL)
+            if not self.config.reload_if_changed():
+                continue
+            problems = list(self.config.problems)
+            try:
+                self.apply_config()
+            except Exception as e:
+                problems.append(f"Could not apply config.yml: {e}")
+            for listener in self.config_listeners:
+                try:
+                    listener(problems)
+                except Exception as e:
+                    # A broken listener must not stop later edits from being picked up
+                    print(f"Config listener failed: {e}", file=sys.stderr)
+
+    def apply_config(self):
+        # timeout, refresh_rate and history_size are read where they are used,
+        # connection pool, workers, log and metrics settings need a restart
+        config = self.config
+        self.scheduler.resize(config.concurrency)
+        self.scheduler.overlap = config.cycle_overlap
+        self.scheduler.jitter = config.jitter
+        self.breaker.threshold = config.breaker_threshold
+        self.breaker.cooldown = config.breaker_cooldown
+        self.breaker.max_backoff = config.backoff_max
+        if self.resolver is not None:
+            self.resolver.ttl = config.dns_cache_ttl
+        alerts = self.alerts
+        alerts.failures = config.alert_failures
+        alerts.recoveries = config.alert_recoveries
+        alerts.slow = config.alert_slow
+        alerts.flap_changes = config.alert_flap_changes
+        alerts.flap_window = config.alert_flap_window
+        alerts.batch_interval = config.alert_batch_interval
+        alerts.webhook = config.alert_webhook
+        alerts.command = config.alert_command
+        alerts.desktop = config.alert_desktop
+
+    def interval_of(self, url):
+        return self.urls.target(url).interval or self.check_interval
+
+    def set_target(self, url, target):
+        self.urls.set_target(url, target)
+        self.reschedule(url)
+
+    def reschedule(self, url):
+        if self.scheduler is not None and url in self.scheduler.intervals:
+            if self.scheduler.intervals[url] != self.interval_of(url):
+                self.scheduler.schedule(url, self.interval_of(url))
+
+    def add(self, url, target=None):
+        if not self.urls.add(url, target):
+            return False
+        if self.scheduler is not None:
+            self.scheduler.schedule(url, self.interval_of(url), first=0)
+        return True
+
+    def remove(self, url):
+        return bool(self.remove_many([url]))
+
+    def add_many(self, entries):
+        """
+        Adds new URLs and updates the settings of known ones in one go.
+        entries: dict of url -> Target, returns the added URLs
+        """
+        added = self.urls.update(entries)
+        if self.scheduler is not None:
+            for url in entries:
+                if url in self.scheduler.intervals:
+                    self.reschedule(url)
+                else:
+                    self.scheduler.schedule(url, self.interval_of(url))
+        return added
+
+    def remove_many(self, urls):
+        """Returns the URLs that were removed."""
+        removed = self.urls.remove_many(urls)
+        self._forget(removed)
+        return removed
+
+    def _forget(self, urls):
+        if self.store is not None and urls:
+            self.store.forget(urls)
+        self.alerts.forget(urls)
+        if self.pool is not None:
+            self.pool.forget(urls)
+        for url in urls:
+            self.metrics.pop(url, None)
+            self.history.pop(url, None)
+            self.breaker.forget(url)
+            if self.scheduler is not None:
+                self.scheduler.unschedule(url)
+            if self.exporter is not None:
+                self.exporter.series.pop(url, None)
+
+    def sync_schedule(self):
+        if self.scheduler is None:
+            return
+        for url in set(self.scheduler.intervals).difference(self.urls):
+            self.scheduler.unschedule(url)
+        for url in self.urls:
+            interval = self.interval_of(url)
+            if self.scheduler.intervals.get(url) != interval:
+                self.scheduler.schedule(url, interval)
+
+    async def probe(self, url):
+        # URLs of a host whose circuit is open fail without touching the network
+        error = self.breaker.check(url)
+        if error is not None:
+            return {
+                "status": None,
+                "response_time": None,
+                "error": error,
+                "last_checked": time.time(),
+                "reused": False,
+                "up": False,
+                "circuit": True,
+            }
+        return await self.send(url)
+
+    def record(self, url, result):
+        backoff = self.breaker.record(url, result)
+        result["backoff"] = backoff
+        if backoff > 1 and self.scheduler is not None:
+            self.scheduler.defer(url, self.interval_of(url) * backoff)
+        self.metrics[url] = result
+        history = self.history.get(url)
+        if history is None:
+            history = self.history[url] = History(self.config.history_size)
+        history.append(result["last_checked"], result["status"], result["response_time"], result["up"])
+        for listener in self.listeners:
+            try:
+                listener(url, result)
+            except Exception as e:
+                # A broken listener must not keep the result from the others or stop the checks
+                print(f"Result listener failed on {url}: {e!r}", file=sys.stderr)
+
+    def stats(self):
+        """
+        Scheduler counters plus loop lag (since the previous call), pool use, memory, alerts sent
+        and the DNS cache counters (None with worker processes).
+        """
+        stats = self.scheduler.stats()
+        stats["loop_lag_max"], stats["loop_lag_avg"] = self.lag.take()
+        stats["pool_in_use"], stats["pool_size"] = self.pool_usage()
+        stats["memory"] = memory_usage()
+        stats["alerts_sent"] = self.alerts.sent
+        stats["alerts_failed"] = self.alerts.failed
+        if self.resolver is not None:
+            stats.update(self.resolver.stats())
+        return stats
+
+    def pool_usage(self):
+        """(connections in use, limit) of the in-process pool, (None, None) with worker processes."""
+        if self.session is None:
+            return None, None
+        connector = self.session.connector
+        # aiohttp has no public counter of the connections in use
+        return len(getattr(connector, "_acquired", ())), connector.limit
+
+    async def check_urls(self):
+        await self.scheduler.run_cycle(self.urls)
+
+    async def check_url(self, session, url, target=DEFAULT_TARGET):
+        method = target.method
+        if method in ("tcp", "tls"):
+            return await self.check_socket(url, method == "tls", target.timeout or self.config.timeout)
+        start_time = time.time()
+        start = time.perf_counter()
+        trace = {"reused": False}
+        timeout = aiohttp.ClientTimeout(total=target.timeout or self.config.timeout)
+        headers = target.request_headers
+        error = None
+        try:
+            if method == "head":
+                async with session.head(url, headers=headers, timeout=timeout, trace_request_ctx=trace) as response:
+                    status = response.status
+                if status in (405, 501):
+                    # Server doesn't support HEAD, fall back to GET
+                    async with session.get(url, headers=headers, timeout=timeout, trace_request_ctx=trace) as response:
+                        status = response.status
+            else:
+                async with session.get(url, headers=headers, timeout=timeout, trace_request_ctx=trace) as response:
+                    status = response.status
+                    if target.body is not None and target.is_up(status):
+                        error = await self.check_body(response, target.body)
+            result = {
+                "status": status,
+                "response_time": time.perf_counter() - start,
+                "error": error,
+                "last_checked": start_time,
+                "reused": trace["reused"],
+                "up": error is None and target.is_up(status),
+            }
+        except aiohttp.ClientConnectorDNSError as e:
+            result = dns_failure(e.os_error, start_time)
+        except Exception as e:
+            result = {
+                "status": None,
+                "response_time": None,
+                "error": str(e) or type(e).__name__,
+                "last_checked": start_time,
+                "reused": trace["reused"],
+                "up": False,
+            }
+        # Connection setup includes name resolution, report them separately
+        dns = trace_span(trace, "dns_start", "dns_end")
+        connect = trace_span(trace, "connect_start", "connect_end")
+        result["dns"] = dns
+        result["connect"] = connect - (dns or 0) if connect is not None else None
+        result["ttfb"] = trace_span(trace, "request_sent", "response_start")
+        return result
+
+    async def check_body(self, response, body):
+        """Runs a BodyCheck over the response as it streams in, returns what failed or None."""
+        scan = body.scan(self.config.body_limit, response.content_length)
+        if not scan.done:
+            async for chunk in response.content.iter_any():
+                if scan.feed(chunk):
+                    # The rest is never read, the connection is closed instead of reused
+                    break
+        return scan.result()
+
+    async def check_socket(self, url, tls, timeout):
+        parts = urlsplit(url if "://" in url else f"tcp://{url}")
+        host = parts.hostname
+        start_time = time.time()
+        start = time.perf_counter()
+        try:
+            port = parts.port or DEFAULT_PORTS.get(parts.scheme, 443 if tls else 80)
+            addresses = [host]
+            if self.resolver is not None:
+                try:
+                    resolved = await asyncio.wait_for(self.resolver.resolve(host, port, socket.AF_UNSPEC), timeout)
+                except OSError as e:
+                    return dns_failure(e, start_time)
+                addresses = [address["host"] for address in resolved]
+            # Like open_connection on a host name, every address is tried in turn (an unreachable
+            # IPv6 address first is common); each gets an even share of the time left
+            for i, address in enumerate(addresses):
+                remaining = timeout - (time.perf_counter() - start)
+                try:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(
+                            address, port,
+                            ssl=ssl_context if tls else None,
+                            server_hostname=host if tls else None,
+                        ),
+                        remaining / (len(addresses) - i),
+                    )
+                    break
+                except (OSError, asyncio.TimeoutError):
+                    if i == len(addresses) - 1:
+                        raise
+            elapsed = time.perf_counter() - start
+            cert = writer.get_extra_info("peercert") if tls else None
+            writer.close()
+            return {
+                "status": None,
+                "response_time": elapsed,
+                "error": None,
+                "last_checked": start_time,
+                "reused": False,
+                "up": True,
+                "cert_expires": ssl.cert_time_to_seconds(cert["notAfter"]) if cert else None,
+            }
+        except Exception as e:
+            return {
+                "status": None,
+                "response_time": None,
+                "error": str(e) or type(e).__name__,
+                "last_checked": start_time,
+                "reused": False,
+                "up": False,
+            }
@@ -0,0 +1,107 @@
+from array import array
+from bisect import bisect_left
+from aiohttp import web
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Series:
+    __slots__ = ("checks", "errors", "status", "up", "last_checked", "latency_sum", "buckets")
+
+    def __init__(self):
+        self.checks = 0
+        self.errors = 0
+        self.status = 0
+        self.up = 0
+        self.last_checked = 0.0
+        self.latency_sum = 0.0
+        # Per-bucket (not cumulative) counts, the last one is +Inf
+        self.buckets = array("Q", bytes(8 * (len(BUCKETS) + 1)))
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsExporter:
+    def __init__(self, engine, host="127.0.0.1", port=9464):
+        """
+        Serves the engine's results in the Prometheus text format on /metrics.
+        Counters are updated as results arrive, so a scrape only walks them once per URL.
+        """
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.series = {}
+        self.runner = None
+
+    def __call__(self, url, result):
+        series = self.series.get(url)
+        if series is None:
+            series = self.series[url] = Series()
+        status = result["status"]
+        series.checks += 1
+        series.status = status or 0
+        series.up = 1 if result["up"] else 0
+        series.last_checked = result["last_checked"]
+        if result["error"] is not None and status is None:
+            series.errors += 1
+        latency = result["response_time"]
+        if latency is not None:
+            series.latency_sum += latency
+            series.buckets[bisect_left(BUCKETS, latency)] += 1
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def handle_metrics(self, request):
+        return web.Response(
+            body=self.render().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    def render(self):
+        gauges = {
+            "pingdog_up": ("gauge", "1 if the last check succeeded (2xx/3xx status, or connected for tcp/tls checks)", []),
+            "pingdog_status_code": ("gauge", "HTTP status of the last check, 0 if there was no response", []),
+            "pingdog_last_checked_timestamp_seconds": ("gauge", "Unix time of the last check", []),
+            "pingdog_checks_total": ("counter", "Number of checks", []),
+            "pingdog_errors_total": ("counter", "Number of checks that failed without a response", []),
+        }
+        histogram = []
+        for url in self.engine.urls:
+            series = self.series.get(url)
+            if series is None:
+                continue
+            label = f'url="{escape_label(url)}"'
+            gauges["pingdog_up"][2].append(f"pingdog_up{{{label}}} {series.up}")
+            gauges["pingdog_status_code"][2].append(f"pingdog_status_code{{{label}}} {series.status}")
+            gauges["pingdog_last_checked_timestamp_seconds"][2].append(f"pingdog_last_checked_timestamp_seconds{{{label}}} {series.last_checked:.3f}")
+            gauges["pingdog_checks_total"][2].append(f"pingdog_checks_total{{{label}}} {series.checks}")
+            gauges["pingdog_errors_total"][2].append(f"pingdog_errors_total{{{label}}} {series.errors}")
+            cumulative = 0
+            for bound, count in zip(BUCKETS, series.buckets):
+                cumulative += count
+                histogram.append(f'pingdog_response_time_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += series.buckets[-1]
+            histogram.append(f'pingdog_response_time_seconds_bucket{{{label},le="+Inf"}} {cumulative}')
+            histogram.append(f"pingdog_response_time_seconds_sum{{{label}}} {series.latency_sum}")
+            histogram.append(f"pingdog_response_time_seconds_count{{{label}}} {cumulative}")
+
+        lines = []
+        for name, (kind, help, samples) in gauges.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        lines.append("# HELP pingdog_response_time_seconds Response time of answered checks")
+        lines.append("# TYPE pingdog_response_time_seconds histogram")
+        lines.extend(histogram)
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import signal
+import sys
+import time
+from engine import ProbeEngine
+
+
+class JsonLinesWriter:
+    def __init__(self, stream=sys.stdout):
+        """Writes one JSON object per result, flushing once per event loop pass."""
+        self.stream = stream
+        self.flush_pending = False
+
+    def __call__(self, url, result):
+        self.stream.write(json.dumps({"url": url, **result}) + "\n")
+        if not self.flush_pending:
+            self.flush_pending = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        self.flush_pending = False
+        self.stream.flush()
+
+    def write_stats(self, stats):
+        self.stream.write(json.dumps({"stats": stats, "time": time.time()}) + "\n")
+        self.stream.flush()
+
+    def write_alerts(self, groups):
+        self.stream.write(json.dumps({"alerts": groups, "time": time.time()}) + "\n")
+        self.stream.flush()
+
+
+def report_config_problems(problems):
+    # stdout only carries JSON lines
+    for problem in problems:
+        print(f"config.yml: {problem}", file=sys.stderr)
+
+
+async def run_headless(config, urls, check_interval, stats_interval=0):
+    """
+    stats_interval: float, seconds between {"stats": ...} lines with the engine's own metrics (0 = never)
+    Alerts are written as {"alerts": [...]} lines.
+    """
+    engine = ProbeEngine(config, urls, check_interval)
+    writer = JsonLinesWriter()
+    engine.add_listener(writer)
+    engine.alerts.add_listener(writer.write_alerts)
+    engine.add_config_listener(report_config_problems)
+    report_config_problems(config.problems)
+    loop = asyncio.get_running_loop()
+    try:
+        # docker stop and systemd send SIGTERM, which stops the run like Ctrl+C, through the finally below
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        on_sigterm = True
+    except NotImplementedError:
+        on_sigterm = False  # Windows
+    try:
+        await engine.start()
+        if stats_interval:
+            engine.stats()  # Start the first window now
+            while True:
+                await asyncio.sleep(stats_interval)
+                writer.write_stats(engine.stats())
+        else:
+            await asyncio.Event().wait()
+    finally:
+        if on_sigterm:
+            loop.remove_signal_handler(signal.SIGTERM)
+        await engine.stop()
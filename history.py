@@ -0,0 +1,87 @@
+from array import array
+from bisect import bisect_left, insort
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class History:
+    def __init__(self, size=500):
+        """
+        Fixed-size ring buffer of check results for a single URL.
+        size: int, number of most recent checks kept (and the uptime/percentile window)
+        """
+        self.size = size
+        self.timestamps = array("d", bytes(8 * size))
+        self.statuses = array("H", bytes(2 * size))  # 0 = no HTTP status
+        self.latencies = array("f", bytes(4 * size))  # -1 = no response
+        self.ups = array("B", bytes(size))
+        self.index = 0
+        self.count = 0
+        self.up = 0
+        # Latencies of the answered checks in the window, kept sorted for percentiles
+        self.sorted = array("f")
+
+    def append(self, timestamp, status, latency, up):
+        i = self.index
+        if self.count == self.size:
+            self._evict(i)
+        else:
+            self.count += 1
+        self.timestamps[i] = timestamp
+        self.statuses[i] = status or 0
+        self.latencies[i] = latency if latency is not None else -1.0
+        self.ups[i] = bool(up)
+        if up:
+            self.up += 1
+        if latency is not None:
+            insort(self.sorted, self.latencies[i])
+        self.index = (i + 1) % self.size
+
+    def extend(self, rows):
+        """
+        Fills an empty History with (timestamp, status, latency, up) rows, oldest first.
+        Sorts the latencies once instead of one insort per row.
+        """
+        rows = rows[-self.size:]
+        for i, (timestamp, status, latency, up) in enumerate(rows):
+            self.timestamps[i] = timestamp
+            self.statuses[i] = status or 0
+            self.latencies[i] = latency if latency is not None else -1.0
+            self.ups[i] = bool(up)
+        self.count = len(rows)
+        self.index = self.count % self.size
+        self.up = sum(self.ups[:self.count])
+        self.sorted = array("f", sorted(latency for latency in self.latencies[:self.count] if latency >= 0))
+
+    def _evict(self, i):
+        if self.ups[i]:
+            self.up -= 1
+        if self.latencies[i] >= 0:
+            del self.sorted[bisect_left(self.sorted, self.latencies[i])]
+
+    def percentile(self, q):
+        if not self.sorted:
+            return None
+        return self.sorted[round(q * (len(self.sorted) - 1))]
+
+    def uptime(self):
+        return self.up / self.count if self.count else None
+
+    def recent(self, n):
+        """Yields the latency of the last `n` checks, oldest first, None when there was no response."""
+        n = min(n, self.count)
+        for k in range(n, 0, -1):
+            latency = self.latencies[(self.index - k) % self.size]
+            yield latency if latency >= 0 else None
+
+    def sparkline(self, n=16):
+        recent = list(self.recent(n))
+        answered = [latency for latency in recent if latency is not None]
+        if not answered:
+            return "×" * len(recent)
+        low, high = min(answered), max(answered)
+        scale = (len(SPARK_CHARS) - 1) / (high - low) if high > low else 0
+        return "".join(
+            SPARK_CHARS[int((latency - low) * scale)] if latency is not None else "×"
+            for latency in recent
+        )
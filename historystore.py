@@ -0,0 +1,120 @@
+import json
+import sqlite3
+import time
+from batchwriter import BatchWriter
+from history import History
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checks (
+    url TEXT NOT NULL,
+    ts REAL NOT NULL,
+    status INTEGER,
+    latency REAL,
+    up INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checks_url_ts ON checks (url, ts);
+CREATE INDEX IF NOT EXISTS checks_ts ON checks (ts);
+CREATE TABLE IF NOT EXISTS last (
+    url TEXT PRIMARY KEY,
+    result TEXT NOT NULL
+);
+"""
+
+# Seconds between two retention passes
+PRUNE_INTERVAL = 3600
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class HistoryStore(BatchWriter):
+    errors = (sqlite3.Error,)
+
+    def __init__(self, file_path, retention=7, flush_interval=1.0, batch_size=5000):
+        """
+        Keeps every check and the last result of each URL in an SQLite database (WAL mode),
+        written in batches from a background thread. Creates the schema, so it is best built
+        in an executor.
+        file_path: str, database path
+        retention: float, days checks are kept (0 = forever)
+        flush_interval, batch_size: see BatchWriter, a batch is one transaction
+        """
+        self.file_path = file_path
+        self.retention = retention
+        self.conn = None
+        self.pruned_at = 0.0
+        conn = sqlite3.connect(file_path)
+        # Freed pages are handed back to the file system after each retention pass,
+        # only takes effect on a new database and before WAL mode is switched on
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.close()
+        super().__init__("pingdog-history", flush_interval, batch_size)
+
+    def forget(self, urls):
+        """Drops everything stored for the URLs, after the results queued before are written."""
+        self.command(list(urls))
+
+    def restore(self, urls, size):
+        """
+        Reads the stored state of the URLs, meant to run in an executor.
+        Returns a dict of url -> (last result, History of up to `size` checks).
+        """
+        conn = connect(self.file_path)
+        try:
+            last = dict(conn.execute("SELECT url, result FROM last"))
+            restored = {}
+            for url in urls:
+                if url in last:
+                    rows = conn.execute(
+                        "SELECT ts, status, latency, up FROM checks WHERE url = ? ORDER BY ts DESC LIMIT ?",
+                        (url, size),
+                    ).fetchall()
+                    rows.reverse()
+                    history = History(size)
+                    history.extend(rows)
+                    restored[url] = (json.loads(last[url]), history)
+            return restored
+        finally:
+            conn.close()
+
+    def _open(self):
+        # SQLite connections stay on the thread that made them
+        self.conn = connect(self.file_path)
+
+    def _close(self):
+        self.conn.close()
+
+    def _after_batch(self):
+        if self.retention and time.monotonic() - self.pruned_at >= PRUNE_INTERVAL:
+            self.pruned_at = time.monotonic()
+            self._prune(self.conn)
+
+    def _write(self, batch, forgotten):
+        conn = self.conn
+        with conn:
+            conn.executemany(
+                "INSERT INTO checks (url, ts, status, latency, up) VALUES (?, ?, ?, ?, ?)",
+                [(url, result["last_checked"], result["status"], result["response_time"], int(bool(result["up"])))
+                 for url, result in batch],
+            )
+            # Only the newest result of each URL in the batch matters
+            last = {url: result for url, result in batch}
+            conn.executemany(
+                "INSERT OR REPLACE INTO last (url, result) VALUES (?, ?)",
+                [(url, json.dumps(result)) for url, result in last.items()],
+            )
+            if forgotten:
+                conn.executemany("DELETE FROM checks WHERE url = ?", ((url,) for url in forgotten))
+                conn.executemany("DELETE FROM last WHERE url = ?", ((url,) for url in forgotten))
+
+    def _prune(self, conn):
+        with conn:
+            conn.execute("DELETE FROM checks WHERE ts < ?", (time.time() - self.retention * 86400,))
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
@@ -0,0 +1,81 @@
+import asyncio
+import cProfile
+import os
+import sys
+
+
+class LoopLagMonitor:
+    def __init__(self, interval=0.05):
+        """
+        Measures event loop lag: how late a callback scheduled `interval` seconds ahead runs.
+        A busy loop (slow rendering, big imports, too many results at once) shows up here.
+        """
+        self.interval = interval
+        self.loop = None
+        self.handle = None
+        self.expected = 0.0
+        self.max = 0.0
+        self.total = 0.0
+        self.count = 0
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._schedule()
+
+    def stop(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def _schedule(self):
+        self.expected = self.loop.time() + self.interval
+        self.handle = self.loop.call_at(self.expected, self._tick)
+
+    def _tick(self):
+        lag = self.loop.time() - self.expected
+        self.max = max(self.max, lag)
+        self.total += lag
+        self.count += 1
+        self._schedule()
+
+    def take(self):
+        """Returns (max, mean) lag in seconds since the previous call."""
+        result = (self.max, self.total / self.count if self.count else 0.0)
+        self.max = self.total = 0.0
+        self.count = 0
+        return result
+
+
+def memory_usage():
+    """Resident memory in bytes (peak memory where the current value can't be read), None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Profiler:
+    def __init__(self):
+        """cProfile of the main thread (the event loop), switched on and off at runtime."""
+        self.profile = None
+
+    @property
+    def running(self):
+        return self.profile is not None
+
+    def start(self):
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self, file_path):
+        """Writes the collected stats to file_path, readable with `python -m pstats`."""
+        self.profile.disable()
+        self.profile.dump_stats(file_path)
+        self.profile = None
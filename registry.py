@@ -0,0 +1,62 @@
+from target import DEFAULT_TARGET
+
+
+class UrlRegistry:
+    def __init__(self, entries=None):
+        """
+        Ordered set of URLs with their Target settings. Backed by a dict, so membership,
+        insert, delete and settings lookups are O(1) and iteration keeps insertion order.
+        URLs with default settings share DEFAULT_TARGET.
+        entries: dict of url -> Target (or None), as returned by read_urls_from_file
+        """
+        self.entries = {}
+        if entries:
+            self.update(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def items(self):
+        """Yields (url, Target) in order."""
+        for url, target in self.entries.items():
+            yield url, DEFAULT_TARGET if target is None else target
+
+    def target(self, url):
+        target = self.entries.get(url)
+        return DEFAULT_TARGET if target is None else target
+
+    def add(self, url, target=None):
+        """Adds a URL at the end, returns False if it is already registered."""
+        if url in self.entries:
+            return False
+        self.entries[url] = None if target is None or target.is_default else target
+        return True
+
+    def set_target(self, url, target):
+        if url in self.entries:
+            self.entries[url] = None if target is None or target.is_default else target
+
+    def remove(self, url):
+        if url not in self.entries:
+            return False
+        del self.entries[url]
+        return True
+
+    def update(self, entries):
+        """Adds new URLs and replaces the settings of registered ones, returns the added URLs."""
+        added = []
+        for url, target in entries.items():
+            if url not in self.entries:
+                added.append(url)
+            self.entries[url] = None if target is None or target.is_default else target
+        return added
+
+    def remove_many(self, urls):
+        """Returns the URLs that were registered and are now removed."""
+        return [url for url in urls if self.remove(url)]
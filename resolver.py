@@ -0,0 +1,112 @@
+import asyncio
+import socket
+import time
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+
+# Fraction of the TTL left when a host still in use is looked up again in the background
+REFRESH_AHEAD = 0.2
+# Seconds a failed lookup is cached, so the URLs of a host that doesn't resolve share one failure
+NEGATIVE_TTL = 5
+
+
+class CacheEntry:
+    __slots__ = ("addresses", "error", "expires", "refresh_at")
+
+    def __init__(self, addresses, error, ttl):
+        now = time.monotonic()
+        self.addresses = addresses
+        self.error = error
+        self.expires = now + ttl
+        self.refresh_at = now + ttl * (1 - REFRESH_AHEAD)
+
+
+class CachingResolver(AbstractResolver):
+    def __init__(self, ttl=300, resolver=None):
+        """
+        Host name cache shared by every check of an engine. Each (host, port, family) is looked
+        up once per ttl seconds and concurrent lookups of a host wait for the same one. A host
+        checked in the last REFRESH_AHEAD of its ttl is looked up again in the background, so
+        hosts in use never expire and their checks never wait for DNS.
+        ttl: float seconds (0 = no caching, only concurrent lookups are shared)
+        resolver: AbstractResolver doing the lookups, aiohttp's default one if None
+        """
+        self.ttl = ttl
+        self.resolver = resolver or DefaultResolver()
+        self.cache = {}
+        self.pending = {}  # key -> task of the lookup in progress
+        self.next_prune = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.refreshes = 0
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        key = (host, port, family)
+        entry = self.cache.get(key)
+        if entry is not None:
+            now = time.monotonic()
+            if now < entry.expires:
+                self.hits += 1
+                if entry.error is not None:
+                    # A fresh copy, raising the cached one again would grow its traceback
+                    raise type(entry.error)(*entry.error.args)
+                if now >= entry.refresh_at and key not in self.pending:
+                    self.refreshes += 1
+                    self._lookup(key)
+                return entry.addresses
+        task = self.pending.get(key)
+        if task is None:
+            self.misses += 1
+            task = self._lookup(key)
+        else:
+            # Joins the lookup another check started, no extra query
+            self.hits += 1
+        # A check that times out must not cancel the lookup other checks wait for
+        return await asyncio.shield(task)
+
+    def _lookup(self, key):
+        task = asyncio.ensure_future(self._fetch(key))
+        self.pending[key] = task
+        task.add_done_callback(lambda _: self.pending.pop(key, None))
+        # Refreshes and lookups whose checks timed out have nobody waiting, a failure only counts
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+
+    async def _fetch(self, key):
+        try:
+            addresses = await self.resolver.resolve(*key)
+        except OSError as e:
+            self.failures += 1
+            entry = self.cache.get(key)
+            if entry is None or entry.error is not None or time.monotonic() >= entry.expires:
+                self._store(key, CacheEntry(None, e, min(self.ttl, NEGATIVE_TTL)))
+            # else a failed refresh, the addresses are used until they expire
+            raise
+        self._store(key, CacheEntry(addresses, None, self.ttl))
+        return addresses
+
+    def _store(self, key, entry):
+        now = time.monotonic()
+        if now >= self.next_prune:
+            # Hosts no longer checked are dropped once they expire
+            self.next_prune = now + max(self.ttl, NEGATIVE_TTL)
+            self.cache = {cached: old for cached, old in self.cache.items() if old.expires > now}
+        self.cache[key] = entry
+
+    def stats(self):
+        """Lookups answered without a query of their own (hits) or with one (misses), failed and background queries."""
+        lookups = self.hits + self.misses
+        return {
+            "dns_hosts": len(self.cache),
+            "dns_hits": self.hits,
+            "dns_misses": self.misses,
+            "dns_hit_ratio": self.hits / lookups if lookups else None,
+            "dns_failures": self.failures,
+            "dns_refreshes": self.refreshes,
+        }
+
+    async def close(self):
+        for task in list(self.pending.values()):
+            task.cancel()
+        await self.resolver.close()
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import os
+import time
+from batchwriter import BatchWriter
+
+CSV_FIELDS = ["url", "last_checked", "status", "up", "response_time", "error", "reused", "dns", "connect", "ttfb", "cert_expires", "dns_error"]
+
+
+class ResultLog(BatchWriter):
+    def __init__(self, file_path, format="jsonl", max_bytes=10000000, rotate_interval=0, backups=5, flush_interval=1.0, batch_size=1000):
+        """
+        Appends check results to a file from a background thread.
+        file_path: str, log file path
+        format: 'jsonl' or 'csv'
+        max_bytes: int, rotate once the file grows past this size (0 = never)
+        rotate_interval: float, rotate after this many seconds (0 = never)
+        backups: int, number of rotated files kept as file.1 ... file.N
+        flush_interval, batch_size: see BatchWriter
+        """
+        self.file_path = file_path
+        self.format = format
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backups = backups
+        self.file = None
+        self.opened_at = 0.0
+        super().__init__("pingdog-log", flush_interval, batch_size)
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+
+    def _write(self, batch, command):
+        if self.file is None or self._should_rotate():
+            self._rotate()
+        self.file.write(self._encode(batch))
+        self.file.flush()
+
+    def _encode(self, batch):
+        if self.format == "csv":
+            out = io.StringIO()
+            writer = csv.writer(out)
+            for url, result in batch:
+                writer.writerow([url] + [result.get(field) for field in CSV_FIELDS[1:]])
+            return out.getvalue()
+        return "".join(json.dumps({"url": url, **result}) + "\n" for url, result in batch)
+
+    def _should_rotate(self):
+        if self.max_bytes and self.file.tell() >= self.max_bytes:
+            return True
+        return bool(self.rotate_interval) and time.monotonic() - self.opened_at >= self.rotate_interval
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+            if self.backups > 0:
+                for i in range(self.backups - 1, 0, -1):
+                    source = f"{self.file_path}.{i}"
+                    if os.path.exists(source):
+                        os.replace(source, f"{self.file_path}.{i + 1}")
+                os.replace(self.file_path, f"{self.file_path}.1")
+            else:
+                os.remove(self.file_path)
+        new_file = not os.path.exists(self.file_path) or os.path.getsize(self.file_path) == 0
+        self.file = open(self.file_path, "a", encoding="utf-8", newline="")
+        self.opened_at = time.monotonic()
+        if self.format == "csv" and new_file:
+            csv.writer(self.file).writerow(CSV_FIELDS)
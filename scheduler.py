@@ -0,0 +1,167 @@
+import asyncio
+import heapq
+import random
+import time
+
+
+class ProbeScheduler:
+    def __init__(self, probe, on_result, concurrency=100, overlap="coalesce", jitter=0.1):
+        """
+        probe: async callable taking a URL and returning its result
+        on_result: callable(url, result) invoked as each probe completes
+        concurrency: int, maximum number of probes running at once
+        overlap: 'skip' drops a probe that is due while the previous one for the same URL is running,
+                 'coalesce' runs a single follow-up probe once it finishes
+        jitter: float, fraction of the interval each next due time is randomly shifted by
+        """
+        self.probe = probe
+        self.on_result = on_result
+        self.concurrency = concurrency
+        self.overlap = overlap
+        self.jitter = jitter
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.intervals = {}
+        self.due = {}
+        self.heap = []
+        self.counter = 0
+        self.active = set()
+        self.pending = set()
+        self.tasks = set()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.in_flight = 0
+        self.backlog = 0
+        self.probes = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.last_cycle_duration = None
+        self._rate_mark = (time.monotonic(), 0)
+
+    def resize(self, concurrency):
+        if concurrency != self.concurrency:
+            # Probes already waiting on the old semaphore still finish under the old limit
+            self.concurrency = concurrency
+            self.semaphore = asyncio.Semaphore(concurrency)
+
+    def schedule(self, url, interval, first=None):
+        """
+        Add a URL or change its interval. Unless `first` (seconds from now) is given
+        the first probe lands at a random point within one interval, so URLs sharing
+        an interval are spread evenly instead of firing in one burst.
+        """
+        self.intervals[url] = interval
+        delay = random.uniform(0, interval) if first is None else first
+        self._push(url, time.monotonic() + delay)
+
+    def unschedule(self, url):
+        self.intervals.pop(url, None)
+        self.due.pop(url, None)
+        self.pending.discard(url)
+
+    def defer(self, url, delay):
+        """Move the next probe of a scheduled URL to `delay` seconds from now, keeping its interval."""
+        if url in self.intervals:
+            self._push(url, time.monotonic() + delay)
+
+    def _push(self, url, due):
+        # Replaced entries stay in the heap and are dropped when popped
+        self.due[url] = due
+        self.counter += 1
+        heapq.heappush(self.heap, (due, self.counter, url))
+        if self.heap[0][2] == url:
+            self.wakeup.set()
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self.heap and self.heap[0][0] <= now:
+                due, _, url = heapq.heappop(self.heap)
+                if self.due.get(url) != due:
+                    continue
+                self.dispatch(url)
+                interval = self.intervals[url]
+                next_due = due + interval * (1 + random.uniform(-self.jitter, self.jitter))
+                if next_due <= now:
+                    # Fell behind, don't try to catch up with a burst
+                    next_due = now + interval
+                self._push(url, next_due)
+            self.wakeup.clear()
+            timeout = self.heap[0][0] - now if self.heap else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def dispatch(self, url):
+        if url in self.active:
+            if self.overlap == "coalesce" and url not in self.pending:
+                self.pending.add(url)
+                self.coalesced += 1
+            else:
+                self.skipped += 1
+            return
+        self.active.add(url)
+        return self._spawn(url)
+
+    def _spawn(self, url):
+        task = asyncio.ensure_future(self._probe(url))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _probe(self, url):
+        self.backlog += 1
+        waiting = True
+        try:
+            async with self.semaphore:
+                self.backlog -= 1
+                waiting = False
+                self.in_flight += 1
+                try:
+                    result = await self.probe(url)
+                finally:
+                    self.in_flight -= 1
+            self.probes += 1
+            if url in self.intervals:
+                self.on_result(url, result)
+            return result
+        finally:
+            if waiting:
+                self.backlog -= 1
+            self.active.discard(url)
+            if url in self.pending:
+                self.pending.discard(url)
+                self.dispatch(url)
+
+    async def run_cycle(self, urls):
+        """Probe every URL once, right now, and wait for all of them."""
+        start = time.perf_counter()
+        tasks = [self.dispatch(url) for url in urls if url not in self.active]
+        # A check that fails must not end the cycle before the others, or keep regular checks from starting
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.last_cycle_duration = time.perf_counter() - start
+
+    def stats(self):
+        now = time.monotonic()
+        mark_time, mark_probes = self._rate_mark
+        rate = (self.probes - mark_probes) / (now - mark_time) if now > mark_time else 0.0
+        self._rate_mark = (now, self.probes)
+        return {
+            "urls": len(self.intervals),
+            "rate": rate,
+            "cycle_duration": self.last_cycle_duration,
+            "in_flight": self.in_flight,
+            "backlog": self.backlog,
+            "skipped": self.skipped,
+            "coalesced": self.coalesced,
+        }
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+        for task in list(self.tasks):
+            task.cancel()
@@ -0,0 +1,44 @@
+# The DataTable internals PingDog relies on to move rows without sorting the whole table and to
+# resize it without re-measuring columns, all in one place. They were checked against the Textual
+# versions requirements.txt allows; where they are missing the slower public API is used instead.
+try:
+    from textual._two_way_dict import TwoWayDict
+except ImportError:
+    TwoWayDict = None
+
+INTERNALS = ("_row_locations", "_update_count", "_require_update_dimensions")
+
+
+def has_internals(table):
+    return TwoWayDict is not None and all(hasattr(table, name) for name in INTERNALS)
+
+
+def place_rows(table, keys, column, ranks):
+    """
+    Moves the rows of `keys` (RowKeys, in the order they should be shown) onto the table
+    positions they already take up, the way DataTable.sort sets them.
+    column, ranks: fallback without the internals, DataTable.sort by the plain text of the
+                   column's cells with ranks() returning a dict of text -> position of every row
+    """
+    if not has_internals(table):
+        order = ranks()
+        table.sort(column, key=lambda cell: order[cell.plain])
+        return
+    if len(keys) == table.row_count:
+        table._row_locations = TwoWayDict({key: position for position, key in enumerate(keys)})
+    else:
+        locations = table._row_locations
+        for key, position in zip(keys, sorted(locations.get(key) for key in keys)):
+            locations[key] = position
+    table._update_count += 1
+    table.refresh()
+
+
+def resize_table(table):
+    """Recomputes the scrollable size after column content_width was widened directly."""
+    if has_internals(table):
+        # Done once the table is idle, like after update_cell(update_width=True)
+        table._require_update_dimensions = True
+        table.check_idle()
+    else:
+        table.refresh(layout=True)
@@ -0,0 +1,212 @@
+from bisect import bisect_left
+from math import inf
+
+
+# Sort keys over a URL's last result; the ascending order puts the interesting rows first
+def status_key(metrics):
+    if not metrics:
+        return (2, 0)
+    return (1 if metrics.get("up") else 0, metrics.get("status") or 0)
+
+
+def response_time_key(metrics):
+    # Slowest first, URLs without a response time last
+    response_time = metrics.get("response_time") if metrics else None
+    return -response_time if response_time is not None else inf
+
+
+def last_checked_key(metrics):
+    # Most recently checked first
+    last_checked = metrics.get("last_checked") if metrics else None
+    return -last_checked if last_checked else inf
+
+
+def insertion_key(metrics):
+    # Every URL ties, so the index keeps the order URLs were added in
+    return 0
+
+
+SORT_KEYS = {
+    "url": insertion_key,
+    "status": status_key,
+    "response_time": response_time_key,
+    "last_checked": last_checked_key,
+}
+
+
+class SortIndex:
+    def __init__(self, key=insertion_key):
+        """
+        URLs ordered by key(metrics), kept sorted as results come in: a changed key is one
+        bisect out and one bisect in instead of a sort of every URL.
+        Ties keep the order URLs were added to the index in.
+        """
+        self.key = key
+        self.keys = {}
+        self.order = []
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        for _, _, url in self.order:
+            yield url
+
+    def __reversed__(self):
+        for _, _, url in reversed(self.order):
+            yield url
+
+    def __contains__(self, url):
+        return url in self.keys
+
+    def build(self, items):
+        """Indexes every (url, metrics) at once, with one sort."""
+        self.keys = {}
+        self.order = []
+        for url, metrics in items:
+            self.counter += 1
+            entry = (self.key(metrics), self.counter)
+            self.keys[url] = entry
+            self.order.append((*entry, url))
+        self.order.sort()
+
+    def update(self, url, metrics):
+        """
+        Adds a URL or re-keys it. Returns the (first, last) positions whose URL may have
+        changed, None if the order is the same.
+        """
+        key = self.key(metrics)
+        old = self.keys.get(url)
+        if old is not None:
+            if old[0] == key:
+                return None
+            sequence = old[1]
+            position = bisect_left(self.order, (*old, url))
+            del self.order[position]
+        else:
+            self.counter += 1
+            sequence = self.counter
+            position = len(self.order)
+        entry = (key, sequence, url)
+        self.keys[url] = entry[:2]
+        new_position = bisect_left(self.order, entry)
+        self.order.insert(new_position, entry)
+        if new_position == position:
+            return None
+        return min(position, new_position), max(position, new_position)
+
+    def remove(self, url):
+        old = self.keys.pop(url, None)
+        if old is not None:
+            del self.order[bisect_left(self.order, (*old, url))]
+
+    def position(self, url):
+        key, sequence = self.keys[url]
+        return bisect_left(self.order, (key, sequence, url))
+
+    def between(self, first, last):
+        """Yields the URLs at positions first to last."""
+        for _, _, url in self.order[first:last + 1]:
+            yield url
+
+
+class RowFilter:
+    def __init__(self, query=""):
+        """
+        Space separated terms, all of which a row must match:
+        errors (or down): the last check failed
+        2xx, 3xx, 4xx, 5xx: the HTTP status is in one of the given classes
+        tag:name: the URL has the tag
+        anything else: part of the URL, case insensitive
+        """
+        self.query = query.strip()
+        self.errors = False
+        self.classes = set()
+        self.tags = []
+        self.words = []
+        for term in self.query.split():
+            lowered = term.lower()
+            if lowered in ("errors", "down"):
+                self.errors = True
+            elif len(lowered) == 3 and lowered[0] in "12345" and lowered[1:] == "xx":
+                self.classes.add(int(lowered[0]))
+            elif lowered.startswith("tag:") and len(term) > 4:
+                self.tags.append(term[4:])
+            else:
+                self.words.append(lowered)
+
+    def __bool__(self):
+        return bool(self.query)
+
+    def __call__(self, url, target, metrics):
+        if self.errors and (not metrics or metrics.get("up")):
+            return False
+        if self.classes and (not metrics or (metrics.get("status") or 0) // 100 not in self.classes):
+            return False
+        for tag in self.tags:
+            if tag not in target.tags:
+                return False
+        if self.words:
+            lowered = url.lower()
+            for word in self.words:
+                if word not in lowered:
+                    return False
+        return True
+
+
+class TableView:
+    def __init__(self):
+        """
+        Which URLs the table shows and in what order: a sort column (None for the order
+        URLs were added in), its direction and a RowFilter.
+        The index covers every URL, so changing the filter needs no sort.
+        """
+        self.column = None
+        self.reverse = False
+        self.filter = RowFilter()
+        self.index = SortIndex()
+
+    @property
+    def sorted(self):
+        """True unless rows are shown in the order URLs were added in."""
+        return self.column is not None or self.reverse
+
+    def build(self, items):
+        self.index.build(items)
+
+    def sort_by(self, column, reverse, items):
+        """items: (url, metrics) of every URL in insertion order"""
+        self.column = column
+        self.reverse = reverse
+        self.index = SortIndex(SORT_KEYS[column or "url"])
+        self.index.build(items)
+
+    def update(self, url, target, metrics):
+        """Re-indexes a URL after a result, returns (visible, positions changed in the index or None)."""
+        changed = self.index.update(url, metrics)
+        return self.filter(url, target, metrics), changed
+
+    def remove(self, url):
+        self.index.remove(url)
+
+    def last(self, url):
+        """True if the URL comes after every other in display order."""
+        order = self.index.order
+        if not order:
+            return True
+        return (order[0] if self.reverse else order[-1])[2] == url
+
+    def ordered(self):
+        """Yields every URL in display order."""
+        return reversed(self.index) if self.reverse else iter(self.index)
+
+    def visible(self, targets, metrics):
+        """Yields the URLs passing the filter in display order."""
+        urls = self.ordered()
+        if not self.filter:
+            yield from urls
+            return
+        for url in urls:
+            if self.filter(url, targets.target(url), metrics.get(url)):
+                yield url
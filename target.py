@@ -0,0 +1,169 @@
+from bodycheck import BodyCheck
+
+# get: full GET, head: HEAD falling back to GET, range: GET of the first byte only,
+# tcp: TCP connect to host:port, tls: TLS handshake only (records certificate expiry)
+METHODS = ("get", "head", "range", "tcp", "tls")
+DEFAULT_PORTS = {"http": 80, "https": 443, "tcp": 80, "tls": 443}
+
+FIELDS = ("interval", "method", "timeout", "expect", "headers", "tags", "contains", "matches", "json", "sha256", "max_size")
+# Settings checked against the response body, only with method get
+BODY_FIELDS = ("contains", "matches", "json", "sha256", "max_size")
+
+
+def parse_expect(value):
+    # "200", "200,204", "2xx", [200, "3xx"] -> frozenset of status codes
+    items = value.split(",") if isinstance(value, str) else value if isinstance(value, (list, tuple)) else [value]
+    codes = set()
+    for item in items:
+        item = str(item).strip().lower()
+        if len(item) == 3 and item[0].isdigit() and item.endswith("xx"):
+            start = int(item[0]) * 100
+            codes.update(range(start, start + 100))
+        elif item.isdigit():
+            codes.add(int(item))
+        elif item:
+            raise ValueError(f"Invalid expected status '{item}'")
+    return frozenset(codes)
+
+
+def format_expect(codes):
+    # Whole classes are written back as "Nxx"
+    items = []
+    for hundred in sorted({code // 100 for code in codes}):
+        block = set(range(hundred * 100, hundred * 100 + 100))
+        if block <= codes:
+            items.append(f"{hundred}xx")
+        else:
+            items.extend(str(code) for code in sorted(codes & block))
+    return ",".join(items)
+
+
+def parse_headers(value):
+    # {"Name": "value"} or "Name: value" lines
+    if isinstance(value, dict):
+        return {str(name): str(header) for name, header in value.items()}
+    headers = {}
+    for line in str(value).splitlines():
+        name, sep, header = line.partition(":")
+        if not sep or not name.strip():
+            raise ValueError(f"Invalid header '{line}'")
+        headers[name.strip()] = header.strip()
+    return headers
+
+
+def parse_tags(value):
+    items = value.split(",") if isinstance(value, str) else value
+    return tuple(str(tag).strip() for tag in items if str(tag).strip())
+
+
+class Target:
+    __slots__ = FIELDS + ("request_headers", "body", "is_default")
+
+    def __init__(self, interval=None, method="get", timeout=None, expect=None, headers=None, tags=(),
+                 contains=None, matches=None, json=None, sha256=None, max_size=None):
+        """
+        Per-URL check settings, parsed once when the URL is loaded.
+        interval, timeout: float seconds, None uses the global setting
+        method: one of METHODS
+        expect: frozenset of status codes counted as up, None for any 2xx/3xx
+        headers: dict of extra request headers
+        tags: tuple of str
+        contains, matches, json, sha256, max_size: checks on the response body, see BodyCheck
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown method '{method}'")
+        for name, value in (("Interval", interval), ("Timeout", timeout), ("Max size", max_size)):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive")
+        self.interval = interval
+        self.method = method
+        self.timeout = timeout
+        self.expect = expect or None
+        self.headers = headers or None
+        self.tags = tags
+        self.contains = contains or None
+        self.matches = matches or None
+        self.json = json or None
+        self.sha256 = sha256 or None
+        self.max_size = max_size
+        if any(getattr(self, field) for field in BODY_FIELDS):
+            if method != "get":
+                raise ValueError("Body checks need method get")
+            self.body = BodyCheck(self.contains, self.matches, self.json, self.sha256, max_size)
+        else:
+            self.body = None
+        # What check_url sends, so it is not assembled on every check
+        if method == "range":
+            self.request_headers = {**(headers or {}), "Range": "bytes=0-0"}
+        else:
+            self.request_headers = self.headers
+        # Decided once, registry lookups and truth tests must not build to_dict() on every check
+        self.is_default = not self.to_dict()
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a Target from YAML/JSON values or the strings of the line and CSV formats."""
+        kwargs = {}
+        for key, value in data.items():
+            if value is None or value == "":
+                continue
+            if key in ("interval", "timeout"):
+                kwargs[key] = float(value)
+            elif key == "method":
+                kwargs[key] = str(value).lower()
+            elif key == "expect":
+                kwargs[key] = parse_expect(value)
+            elif key == "headers":
+                kwargs[key] = parse_headers(value)
+            elif key == "tags":
+                kwargs[key] = parse_tags(value)
+            elif key == "max_size":
+                kwargs[key] = int(value)
+            elif key in BODY_FIELDS:
+                kwargs[key] = str(value)
+            else:
+                raise ValueError(f"Unknown option '{key}'")
+        return cls(**kwargs)
+
+    def to_dict(self):
+        """Settings that differ from the defaults, in YAML/JSON types."""
+        data = {}
+        if self.interval:
+            data["interval"] = self.interval
+        if self.method != "get":
+            data["method"] = self.method
+        if self.timeout:
+            data["timeout"] = self.timeout
+        if self.expect:
+            data["expect"] = format_expect(self.expect)
+        if self.headers:
+            data["headers"] = dict(self.headers)
+        if self.tags:
+            data["tags"] = list(self.tags)
+        for field in BODY_FIELDS:
+            value = getattr(self, field)
+            if value:
+                data[field] = value
+        return data
+
+    def is_up(self, status):
+        if self.expect is not None:
+            return status in self.expect
+        return status is not None and 200 <= status < 400
+
+    def __bool__(self):
+        return not self.is_default
+
+    def __eq__(self, other):
+        if not isinstance(other, Target):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in FIELDS)
+
+    def __hash__(self):
+        return hash((self.interval, self.method, self.timeout, self.expect, self.tags))
+
+    def __repr__(self):
+        return f"Target({self.to_dict()})"
+
+
+DEFAULT_TARGET = Target()
@@ -0,0 +1,198 @@
+import csv
+import gzip
+import io
+import json
+from urllib.parse import urlsplit, urlunsplit
+import yaml
+from atomicfile import replacing
+from target import Target, DEFAULT_PORTS, FIELDS
+
+# Methods that only open a socket, and the URL schemes named after them
+SOCKET_METHODS = ("tcp", "tls")
+# Lines of a URL file parsed between two progress reports
+PROGRESS_LINES = 10000
+
+# libyaml is much faster on big lists when it is available
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+def file_format(file_path):
+    # URL lists are plain text unless their name (without .gz) says otherwise
+    name = file_path.lower().removesuffix(".gz")
+    for suffix, format in ((".yml", "yaml"), (".yaml", "yaml"), (".json", "json"), (".csv", "csv")):
+        if name.endswith(suffix):
+            return format
+    return "text"
+
+
+def normalize_url(url, method="get"):
+    # Lowercases scheme and host, bare hosts get http:// unless they are tcp/tls targets
+    if "://" not in url:
+        if method in SOCKET_METHODS:
+            return url.lower()
+        url = f"http://{url}"
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in DEFAULT_PORTS or not parts.hostname:
+        raise ValueError(f"Invalid URL '{url}'")
+    if parts.scheme.lower() in SOCKET_METHODS and method not in SOCKET_METHODS:
+        raise ValueError(f"Method {method} can't check '{url}', use tcp or tls")
+    # User name and password keep their case
+    userinfo, at, host = parts.netloc.rpartition("@")
+    return urlunsplit((parts.scheme.lower(), userinfo + at + host.lower(), parts.path, parts.query, parts.fragment))
+
+
+def parse_url_line(line):
+    # "<url> [interval=<seconds>] [method=<method>] [timeout=<seconds>] [expect=<statuses>] [tags=<a,b>]
+    #  [contains=<text>] [matches=<regex>] [json=<path>[=<value>]] [sha256=<hex>] [max_size=<bytes>]"
+    url, *items = line.split()
+    settings = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep or key == "headers":
+            raise ValueError(f"Unknown option '{item}' for {url}")
+        settings[key] = value
+    return parse_target(url, settings)
+
+
+def format_url_line(url, target):
+    items = [url]
+    for key, value in target.to_dict().items():
+        if key == "headers":
+            raise ValueError(f"Headers of {url} can only be saved to a .yml, .json or .csv file")
+        if key == "interval" or key == "timeout":
+            value = f"{value:g}"
+        elif key == "tags":
+            value = ",".join(value)
+        elif isinstance(value, str) and len(value.split()) != 1:
+            raise ValueError(f"The {key} check of {url} can only be saved to a .yml, .json or .csv file")
+        items.append(f"{key}={value}")
+    return " ".join(items)
+
+
+def parse_entry(entry):
+    # A YAML/JSON list item: a bare URL or a mapping with "url" and settings
+    if isinstance(entry, str):
+        return parse_url_line(entry)
+    if not isinstance(entry, dict) or not entry.get("url"):
+        raise ValueError(f"Entry without url: {entry!r}")
+    settings = dict(entry)
+    url = str(settings.pop("url"))
+    return parse_target(url, settings)
+
+
+def parse_target(url, settings):
+    # tcp:// and tls:// URLs are checked with the method of their scheme unless one is given
+    scheme = url.partition("://")[0].lower() if "://" in url else None
+    if scheme in SOCKET_METHODS and not settings.get("method"):
+        settings = {**settings, "method": scheme}
+    try:
+        target = Target.from_dict(settings)
+    except ValueError as e:
+        raise ValueError(f"{e} for {url}") from None
+    return normalize_url(url, target.method), target
+
+
+def format_entry(url, target):
+    settings = target.to_dict()
+    return {"url": url, **settings} if settings else url
+
+
+def csv_row(url, target):
+    row = {"url": url, **target.to_dict()}
+    if "headers" in row:
+        row["headers"] = "\n".join(f"{name}: {value}" for name, value in row["headers"].items())
+    if "tags" in row:
+        row["tags"] = ",".join(row["tags"])
+    return row
+
+
+def iter_url_file(file_path, on_error=None, progress=None):
+    """
+    Yields (url, Target) for every entry of a URL file, plain or gzip-compressed.
+    Text and CSV files are read line by line; YAML and JSON files are parsed whole.
+    Blank lines and lines starting with # are ignored in text files.
+    on_error: callable(entry_number, error) for invalid entries, which are then skipped
+              instead of raising ValueError
+    progress: callable(bytes_read), called every PROGRESS_LINES entries and at the end
+    """
+    format = file_format(file_path)
+    with open(file_path, "rb") as raw:
+        if raw.peek(2)[:2] == b"\x1f\x8b":
+            text = io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding="utf-8", newline="" if format == "csv" else None)
+        else:
+            text = io.TextIOWrapper(raw, encoding="utf-8", newline="" if format == "csv" else None)
+
+        if format in ("yaml", "json"):
+            entries = (yaml.load(text, Loader=YamlLoader) if format == "yaml" else json.load(text)) or []
+            if not isinstance(entries, list):
+                raise ValueError(f"{file_path} must contain a list of URLs")
+        elif format == "csv":
+            entries = ({key: value for key, value in row.items() if key} for row in csv.DictReader(text))
+        else:
+            entries = (line.strip() for line in text)
+
+        for number, entry in enumerate(entries, 1):
+            if entry and not (isinstance(entry, str) and entry.startswith("#")):
+                try:
+                    yield parse_entry(entry)
+                except (ValueError, TypeError) as e:
+                    if on_error is None:
+                        raise ValueError(f"Entry {number}: {e}") from None
+                    on_error(number, e)
+            if progress is not None and number % PROGRESS_LINES == 0:
+                progress(raw.tell())
+        if progress is not None:
+            progress(raw.tell())
+
+
+def read_urls_from_file(file_path):
+    return dict(iter_url_file(file_path))
+
+
+def write_url_file(file_path, entries, progress=None):
+    """
+    Writes (url, Target) entries in the format the file name asks for (.yml/.yaml, .json,
+    .csv, anything else is text), gzip-compressed if it ends in .gz.
+    progress: callable(entries_written), called every PROGRESS_LINES entries
+    """
+    # Written to a temporary file and renamed, so a failed export leaves the old file as it was
+    with replacing(file_path) as temp_path:
+        _write_url_file(file_path, temp_path, entries, progress)
+
+
+def _write_url_file(file_path, temp_path, entries, progress):
+    format = file_format(file_path)
+    opener = gzip.open if file_path.lower().endswith(".gz") else open
+    with opener(temp_path, "wt", encoding="utf-8", newline="" if format == "csv" else None) as f:
+        if format == "csv":
+            writer = csv.DictWriter(f, fieldnames=("url",) + FIELDS)
+            writer.writeheader()
+        elif format == "json":
+            f.write("[")
+
+        def write(chunk, first):
+            if format == "yaml":
+                # Consecutive dumps of lists concatenate into one list
+                f.write(yaml.dump([format_entry(url, target) for url, target in chunk], Dumper=YamlDumper, sort_keys=False, allow_unicode=True))
+            elif format == "json":
+                f.write(("\n" if first else ",\n") + ",\n".join(json.dumps(format_entry(url, target)) for url, target in chunk))
+            elif format == "csv":
+                writer.writerows(csv_row(url, target) for url, target in chunk)
+            else:
+                f.write("\n".join(format_url_line(url, target) for url, target in chunk) + "\n")
+
+        chunk = []
+        written = 0
+        for url, target in entries:
+            chunk.append((url, target))
+            if len(chunk) == PROGRESS_LINES:
+                write(chunk, written == 0)
+                written += len(chunk)
+                chunk.clear()
+                if progress is not None:
+                    progress(written)
+        if chunk:
+            write(chunk, written == 0)
+        if format == "json":
+            f.write("\n]\n")
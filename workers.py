@@ -0,0 +1,238 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+from config import PingDogConfig
+from engine import ProbeEngine, create_session, RESULT_FIELDS, CONFIG_POLL
+from resolver import CachingResolver
+from target import DEFAULT_TARGET
+
+BATCH_SIZE = 256
+BATCH_DELAY = 0.02  # seconds a worker holds results back to fill a batch
+
+
+def shard_of(url, count):
+    # URLs of one host share a worker, so they share its connection pool
+    return zlib.crc32((urlsplit(url).hostname or url).encode()) % count
+
+
+def pack(job, result):
+    return (job, *(result.get(field) for field in RESULT_FIELDS))
+
+
+def unpack(record):
+    return record[0], dict(zip(RESULT_FIELDS, record[1:]))
+
+
+def worker_main(conn, yaml_path):
+    async def run():
+        loop = asyncio.get_running_loop()
+        config = PingDogConfig(yaml_path)
+        engine = ProbeEngine(config, {})
+        # URLs of a host share a worker, so each host is still looked up in one place
+        engine.resolver = CachingResolver(config.dns_cache_ttl)
+        session = create_session(config, engine.resolver)
+        semaphore = asyncio.Semaphore(config.concurrency)
+        outbox = []
+        done = asyncio.Event()
+        tasks = set()
+
+        def flush():
+            if outbox:
+                conn.send(list(outbox))
+                outbox.clear()
+
+        async def probe(job, url, target):
+            async with semaphore:
+                result = await engine.check_url(session, url, target)
+            outbox.append(pack(job, result))
+            if len(outbox) >= BATCH_SIZE:
+                flush()
+            elif len(outbox) == 1:
+                loop.call_later(BATCH_DELAY, flush)
+
+        targets = {}  # url id -> (url, Target), as sent by WorkerPool
+
+        def receive(message):
+            if message is None:
+                done.set()
+                return
+            added, forgotten, jobs = message
+            for url_id, url, target in added:
+                targets[url_id] = (url, target)
+            for url_id in forgotten:
+                targets.pop(url_id, None)
+            for job, url_id in jobs:
+                url, target = targets[url_id]
+                task = loop.create_task(probe(job, url, target))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        def reader():
+            # Connection.recv blocks, so it runs off the event loop
+            while True:
+                try:
+                    batch = conn.recv()
+                except (EOFError, OSError):
+                    batch = None
+                loop.call_soon_threadsafe(receive, batch)
+                if batch is None:
+                    break
+
+        async def watch_config():
+            # Picks up timeout and dns_cache_ttl changes made in config.yml
+            while True:
+                await asyncio.sleep(CONFIG_POLL)
+                config.reload_if_changed()
+                engine.resolver.ttl = config.dns_cache_ttl
+
+        threading.Thread(target=reader, daemon=True).start()
+        watcher = loop.create_task(watch_config())
+        await done.wait()
+        watcher.cancel()
+        for task in tasks:
+            task.cancel()
+        await session.close()
+        await engine.resolver.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+class WorkerPool:
+    def __init__(self, config, count):
+        """
+        Runs checks in `count` worker processes, each with its own event loop and
+        connection pool. Jobs and results cross the pipes in batches of packed tuples.
+        A URL and its Target go to their worker once, as an id that jobs refer to, and again
+        only when the Target changes.
+        """
+        self.config = config
+        self.count = count
+        self.processes = []
+        self.connections = []
+        self.outboxes = []  # per worker: ([(url id, url, Target)], [forgotten url id], [(job id, url id)])
+        self.pending = {}  # job id -> (shard, future)
+        self.next_job = 0
+        self.ids = {}  # url -> (url id, Target its worker has)
+        self.next_id = 0
+        self.flush_pending = False
+        self.loop = None
+        self.send_lock = threading.Lock()
+        self.stopping = False
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context("spawn")
+        for shard in range(self.count):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=worker_main,
+                args=(child_conn, self.config.yaml_path),
+                name=f"pingdog-worker-{shard}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self.processes.append(process)
+            self.connections.append(parent_conn)
+            self.outboxes.append(([], [], []))
+            threading.Thread(target=self._reader, args=(shard, parent_conn), daemon=True).start()
+
+    def probe(self, url, target=DEFAULT_TARGET):
+        shard = shard_of(url, self.count)
+        added, _, jobs = self.outboxes[shard]
+        entry = self.ids.get(url)
+        if entry is None or entry[1] is not target:
+            # Changed settings replace the Target, so an identity check is enough
+            url_id = self.next_id if entry is None else entry[0]
+            self.next_id += entry is None
+            self.ids[url] = (url_id, target)
+            added.append((url_id, url, target))
+        else:
+            url_id = entry[0]
+        job = self.next_job
+        self.next_job += 1
+        future = self.loop.create_future()
+        self.pending[job] = (shard, future)
+        jobs.append((job, url_id))
+        self._flush_soon()
+        return future
+
+    def forget(self, urls):
+        """Drops removed URLs from their workers."""
+        for url in urls:
+            entry = self.ids.pop(url, None)
+            if entry is not None:
+                self.outboxes[shard_of(url, self.count)][1].append(entry[0])
+                self._flush_soon()
+
+    def _flush_soon(self):
+        if not self.flush_pending:
+            # Everything queued in this loop pass goes out as one message per worker
+            self.flush_pending = True
+            self.loop.call_soon(self._flush)
+
+    def _flush(self):
+        self.flush_pending = False
+        for shard, outbox in enumerate(self.outboxes):
+            if any(outbox):
+                self._send(shard, tuple(list(part) for part in outbox))
+                for part in outbox:
+                    part.clear()
+
+    def _send(self, shard, message):
+        try:
+            with self.send_lock:
+                self.connections[shard].send(message)
+        except OSError:
+            self._fail_shard(shard, "Worker process is not running")
+
+    def _reader(self, shard, conn):
+        while True:
+            try:
+                batch = conn.recv()
+            except (EOFError, OSError):
+                if not self.stopping:
+                    self.loop.call_soon_threadsafe(self._fail_shard, shard, "Worker process exited")
+                return
+            self.loop.call_soon_threadsafe(self._deliver, batch)
+
+    def _deliver(self, batch):
+        for record in batch:
+            job, result = unpack(record)
+            entry = self.pending.pop(job, None)
+            if entry is not None and not entry[1].done():
+                entry[1].set_result(result)
+
+    def _fail_shard(self, shard, error):
+        for job, (job_shard, future) in list(self.pending.items()):
+            if job_shard == shard:
+                del self.pending[job]
+                if not future.done():
+                    future.set_result({
+                        "status": None,
+                        "response_time": None,
+                        "error": error,
+                        "last_checked": time.time(),
+                        "up": False,
+                    })
+
+    def stop(self):
+        self.stopping = True
+        for shard in range(len(self.connections)):
+            try:
+                with self.send_lock:
+                    self.connections[shard].send(None)
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        for conn in self.connections:
+            conn.close()